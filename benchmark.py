@@ -0,0 +1,271 @@
+# -*- coding: utf8 -*-
+# benchmark
+# benchmarks of the engine and the rendering of cuatro
+# Alfredo Martin 2021
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import timeit
+from classes.engine import State
+
+version = 'benchmark.v.1.0.0'
+
+engine_benchmarks = ['State.__init__', 'get_score', 'get_best_score_play', 'run_play', 'clone']
+# orientations of the board of the raster comparison
+raster_angles = [(0.3, 0.2, 0.), (0., 0., 0.), (1.2, -0.4, 0.3), (2.5, 0.7, -0.2), (-0.8, 1.1, 0.6), (3.1, -1.3, 1.)]
+render_benchmarks = ['Game.get_polygons3d', 'Board.get_polygons3d', 'Get2dcoords.get_polygons2d', 'ScreenPos.pos',
+                     'Draw.draw', 'Draw.draw.reference']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="""times the engine and rendering functions of cuatro for several
+    board sizes and writes the results as json (run from the cuatro directory). The benchmarks run on a position
+    where a fraction (plays) of the board has been filled. With a baseline (json written by a previous run) the
+    times are compared and the exit code is 1 if any minimum time is slower than tolerance. With compare_rasters
+    nothing is timed: the positions are drawn at several angles with every raster backend and the exit code is 1 if
+    any pixel differs from the reference backend""")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4, 5, 6])
+    parser.add_argument('--game_win', type=int, default=4)
+    parser.add_argument('--plays', type=float, default=0.3)
+    parser.add_argument('--benchmarks', type=str, nargs='+', default=engine_benchmarks + render_benchmarks)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min_time', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default=None)
+    parser.add_argument('--baseline', type=str, default=None)
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    parser.add_argument('--compare_rasters', action='store_true')
+    args = parser.parse_args()
+    return args
+
+
+def get_position(size, win, fraction, seed):
+    """plays the first plays of a game with the score heuristic so the benchmarks run on a realistic position
+    size: int: size of the board
+    win: int: how many items in a row constitute a win of the game
+    fraction: float: fraction of the positions of the board that are filled (the game stops earlier if it is won)
+    seed: int: seed of the random choices
+    returns: instance of State class"""
+    state = State(size=size, win=win, next_turn=1, seed=seed)
+    for _ in range(int(fraction * size ** 3)):
+        play = state.get_best_score_play()[0]
+        state.run_play(play, record=False)
+        if state.game_over:
+            state.undo_play()
+            break
+    return state
+
+
+def get_engine_functions(state, seed):
+    """builds the functions to time for the engine
+    state: instance of State class: position of the benchmarks (it is left as it is)
+    seed: int: seed of the random choices
+    returns: dict: the key is the name of the benchmark and the value a function without arguments"""
+    play = state.get_best_score_play()[0]
+    play3d = (play[0], play[1], int(state.play[play]))
+
+    def run_play():
+        state.run_play(play)
+        state.undo_play()
+
+    return {'State.__init__': lambda: State(size=state.size, win=state.win, next_turn=1, seed=seed),
+            'get_score': lambda: state.get_score(play3d),
+            'get_best_score_play': state.get_best_score_play,
+            'run_play': run_play,
+            'clone': state.clone}
+
+
+def get_scene(state):
+    """builds the screen and the objects that render a position with the default settings of cuatro.py. The screen
+    is a surface of the SDL dummy video driver, so no window is opened
+    state: instance of State class: position to render
+    returns: tuple of the screen (pygame surface), the instances of ScreenPos, Board, Game and Get2dcoords classes"""
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
+    import pygame
+    from classes.screenpos import ScreenPos
+    from classes.board import Board
+    from classes.game import Game
+    from classes.get2dcoords import Get2dcoords
+    pygame.display.init()
+    screen_width, screen_height = 1280, 720
+    screen = pygame.display.set_mode((screen_width, screen_height))
+    width = int(0.35 * screen_width / state.size)
+    space = int(0.7 * screen_width / state.size)
+    screenpos = ScreenPos(c=(600., 0., 0.), t=(0., 0., 0.), e=(0., 0., 600.), height=screen_height,
+                          width=screen_width, horizon=0.3)
+    board = Board(state=state, width=width, space=space, height=10, colors=((20, 20, 20), (200, 200, 200)),
+                  edge_colors=((0, 255, 0), (0, 255, 0)))
+    game = Game(state=state, width=width, space=space, colors=((255, 0, 0), (0, 0, 255)),
+                edge_colors=((255, 255, 255), (255, 255, 255)))
+    get2dcoords = Get2dcoords(light_pos=(500., 500., 0.), offset=(0, 0, 2000), screenpos=screenpos)
+    return screen, screenpos, board, game, get2dcoords
+
+
+def get_polygons2d(board, game, get2dcoords, state, angles):
+    """projects the board and the stones of a position
+    board: instance of Board class
+    game: instance of Game class
+    get2dcoords: instance of Get2dcoords class
+    state: instance of State class: position to render
+    angles: tuple of three angles (in radians)
+    returns: tuple of the 3d polygons, colors and edge colors and the 2d coords, colors, edge colors and shading"""
+    import numpy as np
+    board.get_polygons3d(angles[0])
+    game.get_polygons3d(state)
+    polygons3d = np.concatenate([board.polygons3d, game.polygons3d], axis=0)
+    colors = np.concatenate([board.colors3d, game.colors3d], axis=0)
+    edge_colors = np.concatenate([board.edge_colors3d, game.edge_colors3d], axis=0)
+    coords, colors2d, edge_colors2d, shading = get2dcoords.get_polygons2d(polygons3d=polygons3d, colors=colors,
+                                                                         edge_colors=edge_colors, angles=angles)
+    return polygons3d, colors, edge_colors, coords, colors2d, edge_colors2d, shading
+
+
+def get_render_functions(state):
+    """builds the functions to time for the rendering with the default settings of cuatro.py. Game.get_polygons3d
+    times a play and its undo with the update of the mesh after each of them (run_play alone times the play and the
+    undo)
+    state: instance of State class: position of the benchmarks (it is left as it is)
+    returns: dict: the key is the name of the benchmark and the value a function without arguments"""
+    from classes.draw import Draw
+    screen, screenpos, board, game, get2dcoords = get_scene(state)
+    drawer = Draw(max_shading=0.5)
+    reference_drawer = Draw(max_shading=0.5, raster='reference')
+    angles = (0.3, 0.2, 0.)
+    polygons3d, colors, edge_colors, coords, colors2d, edge_colors2d, shading = \
+        get_polygons2d(board, game, get2dcoords, state, angles)
+    play = state.get_best_score_play()[0]
+
+    def game_polygons3d():  # the mesh is only updated when the state changes, so a play is added and removed
+        state.run_play(play, record=False)
+        game.get_polygons3d(state)
+        state.undo_play()
+        game.get_polygons3d(state)
+
+    return {'Game.get_polygons3d': game_polygons3d,
+            'Board.get_polygons3d': lambda: board.get_polygons3d(angles[0]),
+            'Get2dcoords.get_polygons2d': lambda: get2dcoords.get_polygons2d(polygons3d=polygons3d, colors=colors,
+                                                                             edge_colors=edge_colors, angles=angles),
+            'ScreenPos.pos': lambda: screenpos.pos(get2dcoords.polygons3d),
+            'Draw.draw': lambda: drawer.draw(screen, coords, colors2d, edge_colors2d, shading),
+            'Draw.draw.reference': lambda: reference_drawer.draw(screen, coords, colors2d, edge_colors2d, shading)}
+
+
+def compare_rasters(state, angles_list):
+    """draws a position with every raster backend and counts the pixels that differ from the ones of the
+    reference backend
+    state: instance of State class: position to draw
+    angles_list: list of tuples of three angles (in radians): orientations of the board
+    returns: dict: the key is the name of each backend and the value the number of pixels that differ"""
+    screen, screenpos, board, game, get2dcoords = get_scene(state)
+    import pygame
+    from classes.draw import Draw, raster_backends
+    drawers = {name: Draw(max_shading=0.5, raster=name) for name in raster_backends}
+    differences = {name: 0 for name in raster_backends}
+    for angles in angles_list:
+        coords, colors2d, edge_colors2d, shading = get_polygons2d(board, game, get2dcoords, state, angles)[3:]
+        pixels = dict()
+        for name, drawer in drawers.items():
+            screen.fill((0, 0, 0))
+            drawer.draw(screen, coords, colors2d, edge_colors2d, shading)
+            pixels[name] = pygame.surfarray.array3d(screen)
+        for name in raster_backends:
+            differences[name] += int((pixels[name] != pixels['reference']).any(axis=2).sum())
+    return differences
+
+
+def time_function(function, repeat=5, min_time=0.1):
+    """times a function: the number of calls of each repeat is chosen so that it lasts at least min_time
+    function: function without arguments
+    repeat: int: number of repeats
+    min_time: float: minimum time in seconds of each repeat
+    returns: dict with the fields 'number' (calls per repeat), 'min' and 'median' (seconds per call)"""
+    timer = timeit.Timer(function)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number = max(number + 1, int(number * min(10., 1.2 * min_time / max(elapsed, 1e-9))))
+    times = [elapsed / number] + [timer.timeit(number) / number for _ in range(repeat - 1)]
+    return {'number': number, 'min': min(times), 'median': statistics.median(times)}
+
+
+def run_benchmarks(sizes, win=4, fraction=0.3, benchmarks=None, repeat=5, min_time=0.1, seed=0):
+    """runs the benchmarks for every board size
+    sizes: list of ints: sizes of the board
+    win: int: how many items in a row constitute a win of the game (it is reduced for boards smaller than win)
+    fraction: float: fraction of the board filled before timing
+    benchmarks: list of str or None: names of the benchmarks to run (None runs all of them)
+    repeat: int: number of repeats of each benchmark
+    min_time: float: minimum time in seconds of each repeat
+    seed: int: seed of the random choices
+    returns: list of dicts with the fields 'benchmark', 'size', 'win', 'stones', 'number', 'min' and 'median'"""
+    benchmarks = engine_benchmarks + render_benchmarks if benchmarks is None else benchmarks
+    unknown = [name for name in benchmarks if name not in engine_benchmarks + render_benchmarks]
+    if len(unknown) > 0:
+        raise ValueError('unknown benchmarks ' + ', '.join(unknown))
+    results = []
+    for size in sizes:
+        state = get_position(size, min(win, size), fraction, seed)
+        functions = get_engine_functions(state, seed)
+        if any(name in render_benchmarks for name in benchmarks):
+            functions.update(get_render_functions(state))
+        for name in benchmarks:
+            random.seed(seed)
+            result = {'benchmark': name, 'size': size, 'win': state.win, 'stones': len(state.moves)}
+            result.update(time_function(functions[name], repeat=repeat, min_time=min_time))
+            results.append(result)
+    return results
+
+
+def compare(results, baseline, tolerance=0.1):
+    """compares the results with the results of a previous run
+    results: list of dicts returned by run_benchmarks
+    baseline: list of dicts returned by run_benchmarks
+    tolerance: float: relative slow down of the minimum time reported as a regression
+    returns: list of dicts with the fields 'benchmark', 'size', 'ratio' (time / baseline time) and 'regression'"""
+    previous = {(result['benchmark'], result['size']): result['min'] for result in baseline}
+    comparison = []
+    for result in results:
+        key = (result['benchmark'], result['size'])
+        if key in previous:
+            ratio = result['min'] / previous[key]
+            comparison.append({'benchmark': key[0], 'size': key[1], 'ratio': ratio, 'regression': ratio > 1 + tolerance})
+    return comparison
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.compare_rasters:
+        differ = False
+        for size in args.sizes:
+            state = get_position(size, min(args.game_win, size), args.plays, args.seed)
+            for name, pixels in compare_rasters(state, raster_angles).items():
+                print('{:28s} size {:2d} {:8d} pixels differ'.format(name, size, pixels))
+                differ = differ or pixels > 0
+        sys.exit(1 if differ else 0)
+    results = run_benchmarks(args.sizes, win=args.game_win, fraction=args.plays, benchmarks=args.benchmarks,
+                             repeat=args.repeat, min_time=args.min_time, seed=args.seed)
+    import numpy as np
+    report = {'version': version, 'python': platform.python_version(), 'numpy': np.__version__,
+              'machine': platform.machine(), 'seed': args.seed, 'results': results}
+    for result in results:
+        print('{:28s} size {:2d} {:12.1f} us (median {:.1f} us)'.format(result['benchmark'], result['size'],
+                                                                         1e6 * result['min'], 1e6 * result['median']))
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            report['comparison'] = compare(results, json.load(f)['results'], tolerance=args.tolerance)
+        for item in report['comparison']:
+            print('{:28s} size {:2d} {:8.2f}x{}'.format(item['benchmark'], item['size'], item['ratio'],
+                                                       '  regression' if item['regression'] else ''))
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    if args.baseline is not None and any(item['regression'] for item in report['comparison']):
+        sys.exit(1)
@@ -13,6 +13,7 @@ class Announcement:
     instance attrbutes:
     t: int: how many iterations the text will be dysplayed
     color: color of the text
+    message: str: text to be displayed
     text: pygame surface showing the text
     text_rect: pygame rect form the text
     active: bool: triggers instance destruction
@@ -27,13 +28,18 @@ class Announcement:
         self.color = color
         self.time = time
         self.active = True
+        self.message = text
         style = pygame.font.SysFont('comicsans', 70)
         self.text = style.render(text, False, self.color)
         self.text_rect = self.text.get_rect()
 
-    def update(self, screen):
+    def update(self, screen=None):
+        """counts one iteration and displays the text
+        screen: pygame screen object or None (the iteration is counted but nothing is displayed)"""
         self.t += 1
         self.active = self.t <= self.time
+        if screen is None:
+            return None
         screen_rect = screen.get_rect()
         pos = ((screen_rect[2] / 2) - (self.text_rect[2] / 2), 0)
         screen.blit(self.text, pos)
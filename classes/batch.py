@@ -0,0 +1,177 @@
+# -*- coding: utf8 -*-
+# batch
+# helper class for cuatro
+# Alfredo Martin 2021
+
+import numpy as np
+import time
+from classes.lines import get_line_index
+
+version = 'batch.v.1.0.0'
+
+
+class BatchSimulator:
+    """the instance of this class plays many engine vs engine games in lockstep: every step performs one play in
+    every game that is not over with vectorized numpy operations
+    instance attributes:
+    n: int: number of games
+    size: int: size of the board
+    win: int: how many items in a row constitute a win of the game
+    policy: str: 'score' (same scores and tie breaks as State.get_best_score_play) or 'random'
+    rng: instance of numpy.random.Generator
+    line_index: instance of LineIndex
+    lines: numpy array of shape (l + 1, win): cells of every line plus a padding line made of a cell that is always
+            empty (the extra cell size ** 3 of the boards)
+    boards: numpy array of shape (n, size, size, size) of int8: 0 if the position is empty, 1 or 2 otherwise
+    heights: numpy array of shape (n, size, size) of int8: number of items of each column (the next third
+            coordinate of each 2d play)
+    next_turn: numpy array of shape (n, ) of int8: player that plays next in each game
+    winner: numpy array of shape (n, ) of int8: winner of each game (0 until one player has won)
+    game_over: numpy array of shape (n, ) of bool
+    num_plays: numpy array of shape (n, ) of int: number of plays of each game
+    steps: int: number of steps performed
+    elapsed: float: time in seconds spent in steps
+    """
+
+    def __init__(self, n=1000, size=5, win=4, policy='score', first_turn=None, seed=None):
+        """initiallizes the instance
+        n: int: number of games
+        size: int: size of the board
+        win: int: how many items in a row constitute a win of the game
+        policy: str: 'score' or 'random'
+        first_turn: int (1 or 2) or None: player that plays first in every game (None chooses at random per game)
+        seed: int or None: seed of the random generator"""
+        if policy not in ('score', 'random'):
+            raise ValueError('unknown policy ' + str(policy))
+        self.n = n
+        self.size = size
+        self.win = win
+        self.policy = policy
+        self.rng = np.random.default_rng(seed)
+        self.line_index = get_line_index(size, win)
+        self.lines = np.concatenate([self.line_index.lines, np.full((1, win), size ** 3, dtype='int32')], axis=0)
+        # distance of every 3d position to the center of the board (used to break ties)
+        centered = np.array(self.line_index.coords) - (size - 1) / 2.
+        self.distances = (centered ** 2).sum(axis=1)
+        self.boards = np.zeros((n, size, size, size), dtype='int8')
+        self.heights = np.zeros((n, size, size), dtype='int8')
+        if first_turn is None:
+            self.next_turn = self.rng.integers(1, 3, size=n).astype('int8')
+        else:
+            self.next_turn = np.full(n, first_turn, dtype='int8')
+        self.winner = np.zeros(n, dtype='int8')
+        self.game_over = np.zeros(n, dtype=bool)
+        self.num_plays = np.zeros(n, dtype='int64')
+        self.steps = 0
+        self.elapsed = 0.
+
+    def get_cells(self, games):
+        """computes the flat index of the reachable position of every column
+        games: numpy array of ints: indexes of the games
+        returns: tuple of:
+            cells: numpy array of shape (len(games), size ** 2) of ints (the cell of full columns is not valid)
+            valid: numpy array of shape (len(games), size ** 2) of bool: whether each column is not full"""
+        heights = self.heights[games].reshape(len(games), -1).astype('int64')
+        valid = heights < self.size
+        cells = np.arange(self.size ** 2).reshape(1, -1) * self.size + np.minimum(heights, self.size - 1)
+        return cells, valid
+
+    def choose_random(self, games, valid):
+        """chooses a valid column at random for every game
+        games: numpy array of ints: indexes of the games
+        valid: numpy array of shape (len(games), size ** 2) of bool
+        returns: numpy array of shape (len(games), ) of ints: chosen columns"""
+        keys = np.where(valid, self.rng.random(valid.shape), -1.)
+        return keys.argmax(axis=1)
+
+    def choose_score(self, games, cells, valid):
+        """chooses a column for every game with the scores and tie breaks of State.get_best_score_play
+        games: numpy array of ints: indexes of the games
+        cells: numpy array of shape (len(games), size ** 2) of ints: reachable position of every column
+        valid: numpy array of shape (len(games), size ** 2) of bool
+        returns: numpy array of shape (len(games), ) of ints: chosen columns"""
+        g = len(games)
+        flat = np.concatenate([self.boards[games].reshape(g, -1), np.zeros((g, 1), dtype='int8')], axis=1)
+        reachable = np.zeros(flat.shape, dtype=bool)
+        np.put_along_axis(reachable, cells, valid, axis=1)
+        values = flat[:, self.lines]  # shape (g, l + 1, win)
+        turn = self.next_turn[games].reshape(-1, 1)
+        own = (values == turn.reshape(-1, 1, 1)).sum(axis=2)
+        other = (values == (3 - turn).reshape(-1, 1, 1)).sum(axis=2)
+        reach = reachable[:, self.lines].sum(axis=2)
+        base = 5 * reach + (self.win - own - other - reach)
+        # line scores in tenths (see State.get_line_scores), the padding line never gives the best score
+        own_score = base + 10 * own - 10 * self.win * other
+        other_score = base + 10 * other - 10 * self.win * own
+        own_score[:, -1] = other_score[:, -1] = -10 ** 6
+        lines = self.line_index.padded_lines[cells]  # shape (g, size ** 2, m)
+        rows = np.arange(g).reshape(-1, 1, 1)
+        o_line = own_score[rows, lines]
+        d_line = other_score[rows, lines]
+        o_scores = o_line.max(axis=2)
+        d_scores = d_line.max(axis=2)
+        n_o_scores = (o_line == o_scores[:, :, None]).sum(axis=2)
+        n_d_scores = (d_line == d_scores[:, :, None]).sum(axis=2)
+        low = -10 ** 7
+        max_score = np.maximum(np.where(valid, o_scores, low).max(axis=1), np.where(valid, d_scores, low).max(axis=1))
+        offensive = valid & (o_scores == max_score[:, None])
+        defensive = valid & (d_scores == max_score[:, None])
+        has_o = offensive.any(axis=1)
+        has_d = defensive.any(axis=1)
+        # winner plays and plays that avoid a win of the other player are taken right away (the first one)
+        winning = max_score == 10 * self.win - 5
+        first = np.where(has_o, offensive.argmax(axis=1), defensive.argmax(axis=1))
+        # remove all options that do not have the maximum number of lines giving that score
+        max_n_o = np.where(offensive, n_o_scores, -1).max(axis=1)
+        max_n_d = np.where(defensive, n_d_scores, -1).max(axis=1)
+        max_n = np.where(has_o & has_d, np.maximum(max_n_o, max_n_d), np.where(has_o, max_n_o, max_n_d))
+        offensive &= n_o_scores == max_n[:, None]
+        defensive &= n_d_scores == max_n[:, None]
+        options = np.where(offensive.any(axis=1)[:, None], offensive, defensive)
+        # chose the more centered options and then at random
+        distances = np.where(options, self.distances[cells], np.inf)
+        options &= distances == distances.min(axis=1)[:, None]
+        chosen = self.choose_random(games, options)
+        return np.where(winning, first, chosen)
+
+    def step(self):
+        """performs one play in every game that is not over
+        returns: int: number of games that are still running"""
+        start = time.perf_counter()
+        games = np.flatnonzero(~self.game_over)
+        if len(games) > 0:
+            cells, valid = self.get_cells(games)
+            if self.policy == 'random':
+                columns = self.choose_random(games, valid)
+            else:
+                columns = self.choose_score(games, cells, valid)
+            played = cells[np.arange(len(games)), columns]
+            players = self.next_turn[games]
+            self.boards.reshape(self.n, -1)[games, played] = players
+            self.heights.reshape(self.n, -1)[games, columns] += 1
+            self.num_plays[games] += 1
+            # winner detection through the lines crossing the plays
+            flat = np.concatenate([self.boards[games].reshape(len(games), -1),
+                                   np.zeros((len(games), 1), dtype='int8')], axis=1)
+            values = flat[np.arange(len(games)).reshape(-1, 1, 1), self.lines[self.line_index.padded_lines[played]]]
+            won = (values == players.reshape(-1, 1, 1)).all(axis=2).any(axis=1)
+            self.winner[games[won]] = players[won]
+            self.game_over[games] = won | (self.num_plays[games] == self.size ** 3)
+            self.next_turn[games] = 3 - players
+            self.steps += 1
+        self.elapsed += time.perf_counter() - start
+        return int((~self.game_over).sum())
+
+    def run(self):
+        """plays all the games until they are over
+        returns: dict with the fields 'games', 'wins_1', 'wins_2', 'draws', 'plays', 'seconds' and
+                'games_per_second'"""
+        while self.step() > 0:
+            pass
+        return {'games': self.n, 'wins_1': int((self.winner == 1).sum()), 'wins_2': int((self.winner == 2).sum()),
+                'draws': int((self.winner == 0).sum()), 'plays': int(self.num_plays.sum()), 'seconds': self.elapsed,
+                'games_per_second': self.n / self.elapsed if self.elapsed > 0 else 0.}
+
+
+if __name__ == '__main__':
+    print(version)
@@ -0,0 +1,60 @@
+# -*- coding: utf8 -*-
+# bitboard
+# helper functions for cuatro
+# Alfredo Martin 2021
+
+from classes.lines import get_line_index
+
+version = 'bitboard.v.1.0.0'
+
+# tables already built, the key is the tuple (size, win)
+_tables = dict()
+
+
+def cell_index(pos3d, size):
+    """returns the index of the bit that represents a 3d position
+    pos3d: tuple of three ints
+    size: int: size of the board
+    returns: int"""
+    return int((pos3d[0] * size + pos3d[1]) * size + pos3d[2])
+
+
+def get_tables(size, win):
+    """returns the line tables of a board of the given size and win. The tables are built only once for each
+    (size, win) and are shared (they must not be modified)
+    size: int: size of the board
+    win: int: how many items in a row constitute a win of the game
+    returns: tuple of:
+        lines: list of tuples containing 'win' tuples of three ints (coordinates of the positions of each line)
+        masks: list of ints: bitmask of each line
+        cell_lines: list of tuples of ints (one per cell): indexes of the lines that cross each cell"""
+    key = (size, win)
+    if key not in _tables:
+        index = get_line_index(size, win)
+        lines = [tuple(index.get_diag(line)) for line in range(len(index.lines))]
+        masks = []
+        for cells in index.lines.tolist():
+            mask = 0
+            for cell in cells:
+                mask |= 1 << cell
+            masks.append(mask)
+        cell_lines = [tuple(index.get_lines(cell).tolist()) for cell in range(size ** 3)]
+        _tables[key] = (lines, masks, cell_lines)
+    return _tables[key]
+
+
+def get_winning_line(bits, cell, masks, cell_lines):
+    """checks whether the lines crossing a cell are completely filled by a player
+    bits: int: bitmask of the positions of the player
+    cell: int: index of the cell that was just played
+    masks: list of ints: bitmask of each line
+    cell_lines: list of tuples of ints: indexes of the lines that cross each cell
+    returns: int or None: index of the winning line or None if there is no winning line"""
+    for line in cell_lines[cell]:
+        if bits & masks[line] == masks[line]:
+            return line
+    return None
+
+
+if __name__ == '__main__':
+    print(version)
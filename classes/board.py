@@ -78,28 +78,23 @@ class Board:
         self.polygons3d = None
         self.colors3d = None
         self.edge_colors3d = None
-        self.get_polygons3d(0.)  # gives value to self.cubes3d
+        self.get_polygons3d()  # gives value to self.polygons3d (only once, the board does not change)
 
-    def get_polygons3d(self, a):
-        """this method creates the 3d polygons corresponding to the state of the game as long with the corresponding
-        filling colors for each polygon and the color of the edges (both depending on the player they belong to)
+    def get_polygons3d(self, a=None):
+        """this method creates the 3d polygons of the board as long with the corresponding filling colors for each
+        polygon and the color of the edges. The board never changes, so they are built once when the instance is
+        created (the main loop does not call this method)
         the self.polygons3d is a numpy array of shape (n, 4, 3) being n the number of polygons
         the self.colors3d is a numpy array of shape (n, 3)
         the self.edge_colors3d is a numpy array of shape (n, 3)
+        a: float: not used (kept for compatibility)
         """
-        self.polygons3d = []
-        self.colors3d = []
-        self.edge_colors3d = []
-        for i in range(self.size):
-            for j in range(self.size):
-                index_tuple = (0, i, j)
-                self.polygons3d.append(self.bcube3d + self.midpoint + np.array(index_tuple) * self.space)
-                self.colors3d.append([self.colors[0] for _ in range(6)])
-                self.edge_colors3d.append([self.edge_colors[0] for _ in range(6)])
-        # concatenate all the cubes
-        self.polygons3d = np.concatenate(self.polygons3d, axis=0)
-        self.colors3d = np.array(self.colors3d).reshape(-1, 3)
-        self.edge_colors3d = np.array(self.edge_colors3d).reshape(-1, 3)
+        index_tuples = np.array([(0, i, j) for i in range(self.size) for j in range(self.size)])
+        cubes = self.bcube3d.reshape(1, 6, 4, 3) + self.midpoint.reshape(1, 1, 1, 3) + \
+            index_tuples.reshape(-1, 1, 1, 3) * self.space
+        self.polygons3d = np.ascontiguousarray(cubes.reshape(-1, 4, 3))
+        self.colors3d = np.full((len(self.polygons3d), 3), self.colors[0], dtype='int64')
+        self.edge_colors3d = np.full((len(self.polygons3d), 3), self.edge_colors[0], dtype='int64')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,199 @@
+# -*- coding: utf8 -*-
+# book
+# helper class for cuatro
+# Alfredo Martin 2021
+
+import os
+import mmap
+import struct
+import argparse
+import time
+from classes.engine import State
+from classes.symmetry import get_canonical_hash, transform_play, inverse_play
+from classes.zobrist import get_zobrist_keys
+
+version = 'book.v.1.0.0'
+
+# file layout: a header followed by fixed size records sorted by key
+header = struct.Struct('<8sIIIQQ')  # magic, format version, size, win, zobrist turn key, number of records
+record = struct.Struct('<QHHi')  # canonical hash, column of the play in the canonical position, depth, score
+magic = b'CUATROBK'
+format_version = 1
+
+
+def get_book_path(size, win, directory='books'):
+    """returns the path of the book file of a board
+    size: int: size of the board
+    win: int: how many items in a row constitute a win of the game
+    directory: str: directory of the books
+    returns: str"""
+    return os.path.join(directory, 'book_{}_{}.bin'.format(size, win))
+
+
+class OpeningBook:
+    """the instance of this class gives the plays of an opening book stored in a file. The file is memory mapped
+    and looked up with a binary search, so nothing is read or parsed when it is opened
+    instance attributes:
+    path: str: path of the book file
+    size: int: size of the board
+    win: int: how many items in a row constitute a win of the game
+    count: int: number of positions in the book
+    data: mmap object with the content of the file
+    hits: int: number of lookups that found the position
+    misses: int: number of lookups that did not find the position
+    """
+
+    def __init__(self, path):
+        """opens a book file
+        path: str: path of the book file"""
+        self.path = path
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        file_magic, file_version, self.size, self.win, turn_key, self.count = header.unpack_from(self.data, 0)
+        if file_magic != magic or file_version != format_version:
+            raise ValueError(path + ' is not a valid book file')
+        if turn_key != get_zobrist_keys(self.size)[1]:
+            raise ValueError(path + ' was built with different zobrist keys')
+        if header.size + self.count * record.size > len(self.data):
+            raise ValueError(path + ' is truncated')
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        """finds a position in the book with a binary search
+        key: int: canonical hash of the position
+        returns: tuple of (column, depth, score) or None if the position is not in the book"""
+        low = 0
+        high = self.count
+        while low < high:
+            mid = (low + high) // 2
+            mid_key, column, depth, score = record.unpack_from(self.data, header.size + mid * record.size)
+            if mid_key < key:
+                low = mid + 1
+            elif mid_key > key:
+                high = mid
+            else:
+                self.hits += 1
+                return column, depth, score
+        self.misses += 1
+        return None
+
+    def get_play(self, state):
+        """gives the play of the book for a position
+        state: instance of State class
+        returns: tuple of two ints or None if the position is not in the book (or the board is different)"""
+        if state.size != self.size or state.win != self.win or state.game_over:
+            return None
+        key, transform = get_canonical_hash(state)
+        entry = self.lookup(key)
+        if entry is None:
+            return None
+        play = inverse_play(divmod(entry[0], self.size), transform, self.size)
+        if play not in state.valid_pos:
+            return None
+        return play
+
+    def close(self):
+        """closes the file"""
+        self.data.close()
+
+
+def load_book(size, win, directory='books'):
+    """opens the book of a board if there is one
+    size: int: size of the board
+    win: int: how many items in a row constitute a win of the game
+    directory: str: directory of the books
+    returns: instance of OpeningBook or None"""
+    path = get_book_path(size, win, directory)
+    if not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
+
+def write_book(path, size, win, entries):
+    """writes a book file
+    path: str: path of the file
+    size: int: size of the board
+    win: int: how many items in a row constitute a win of the game
+    entries: dict: the key is the canonical hash of each position and the value a tuple of column (play in the
+            canonical position), depth and score"""
+    directory = os.path.dirname(path)
+    if directory != '' and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, 'wb') as f:
+        f.write(header.pack(magic, format_version, size, win, get_zobrist_keys(size)[1], len(entries)))
+        for key in sorted(entries.keys()):
+            column, depth, score = entries[key]
+            f.write(record.pack(key, column, depth, max(-2 ** 31, min(score, 2 ** 31 - 1))))
+
+
+def search_position(size, win, first_turn, moves, time_limit):
+    """searches the best play of a position (module function so it can run in other processes)
+    size: int: size of the board
+    win: int: how many items in a row constitute a win of the game
+    first_turn: int (1 or 2): player that played first
+    moves: list of tuples of two ints: plays that lead to the position
+    time_limit: float: time in seconds of the search
+    returns: tuple of canonical hash and a tuple of column (in the canonical position), depth and score"""
+    from classes.search import AlphaBeta  # imported here so reading books does not load the search
+    state = State(size=size, win=win, next_turn=first_turn)
+    for play in moves:
+        state.run_play(play, record=False)
+    engine = AlphaBeta(time_limit=time_limit)
+    play = engine.get_play(state)
+    key, transform = get_canonical_hash(state)
+    play = transform_play(play, transform, size)
+    return key, (play[0] * size + play[1], engine.depth, engine.score)
+
+
+def build_book(size=5, win=4, depth=2, time_limit=1., workers=1, path=None):
+    """builds a book searching every position (up to symmetry) reached within a number of plies from the empty
+    board, with both players starting
+    size: int: size of the board
+    win: int: how many items in a row constitute a win of the game
+    depth: int: number of plies covered by the book
+    time_limit: float: time in seconds of the search of each position
+    workers: int: number of processes
+    path: str or None: path of the file (None uses get_book_path)
+    returns: int: number of positions in the book"""
+    from concurrent.futures import ProcessPoolExecutor
+    level = [(first_turn, []) for first_turn in (1, 2)]
+    positions = []
+    seen = set()
+    for ply in range(depth):
+        next_level = []
+        for first_turn, moves in level:
+            state = State(size=size, win=win, next_turn=first_turn)
+            for play in moves:
+                state.run_play(play, record=False)
+            key = get_canonical_hash(state)[0]
+            if state.game_over or key in seen:
+                continue
+            seen.add(key)
+            positions.append((first_turn, moves))
+            if ply + 1 < depth:
+                next_level += [(first_turn, moves + [play]) for play in state.valid_pos]
+        level = next_level
+    args = [(size, win, first_turn, moves, time_limit) for first_turn, moves in positions]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(search_position, *zip(*args)))
+    else:
+        results = [search_position(*arg) for arg in args]
+    write_book(get_book_path(size, win) if path is None else path, size, win, dict(results))
+    return len(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="""builds an opening book (run from the cuatro directory)""")
+    parser.add_argument('--game_size', type=int, default=5)
+    parser.add_argument('--game_win', type=int, default=4)
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--engine_time', type=float, default=1.)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--path', type=str, default=None)
+    args = parser.parse_args()
+    start = time.time()
+    count = build_book(size=args.game_size, win=args.game_win, depth=args.depth, time_limit=args.engine_time,
+                       workers=args.workers, path=args.path)
+    print(version, count, 'positions', round(time.time() - start, 1), 'seconds')
@@ -8,15 +8,60 @@ import pygame
 version = 'draw.v.1.0.0'
 
 
+class ReferenceRaster:
+    """raster backend that draws the polygons one by one converting every node to a tuple (the original
+    implementation, kept as the reference for pixel comparisons of the other backends)
+    A raster backend has the method draw_polygons(screen, arr, colors, edge_colors), which draws the polygons in the
+    order they are given with the colors already shaded"""
+
+    def draw_polygons(self, screen, arr, colors, edge_colors):
+        """draws a set of polygons into the screen
+        screen: pygame screen object
+        arr: numpy array of shape (n, m, 2) containing n polygons of m nodes
+        colors: numpy array of shape (n, 3) containing rgb color codes for n polygons
+        edge_colors: numpy array of shape (n, 3) containing rgb edge color codes for n polygons"""
+        for polygon, color, edge_color in zip(arr, colors, edge_colors):
+            coords = [tuple(node) for node in polygon]
+            color_rgb = tuple(color)
+            edge_color_rgb = tuple(edge_color)
+            pygame.draw.polygon(screen, color_rgb, coords)
+            pygame.draw.polygon(screen, edge_color_rgb, coords, 1)
+
+
+class BatchedRaster:
+    """raster backend that converts the nodes and the colors of all the polygons to python lists at once (numpy
+    tolist) and then only calls pygame in the loop, which removes most of the python work per polygon. The pixels
+    are the same as the ones of ReferenceRaster"""
+
+    def draw_polygons(self, screen, arr, colors, edge_colors):
+        """draws a set of polygons into the screen
+        screen: pygame screen object
+        arr: numpy array of shape (n, m, 2) containing n polygons of m nodes
+        colors: numpy array of shape (n, 3) containing rgb color codes for n polygons
+        edge_colors: numpy array of shape (n, 3) containing rgb edge color codes for n polygons"""
+        polygon = pygame.draw.polygon
+        lines = pygame.draw.lines  # the edge of a polygon is its closed outline
+        for coords, color_rgb, edge_color_rgb in zip(arr.tolist(), colors.tolist(), edge_colors.tolist()):
+            polygon(screen, color_rgb, coords)
+            lines(screen, edge_color_rgb, True, coords)
+
+
+# raster backends that can be chosen by name
+raster_backends = {'reference': ReferenceRaster, 'batched': BatchedRaster}
+
+
 class Draw:
     """the instance of this class draws a set of polygons in the screen  and applies shading
     instance attributes:
-    max_shading: float: maximum ratio of shading applied"""
+    max_shading: float: maximum ratio of shading applied
+    raster: raster backend (instance of ReferenceRaster, BatchedRaster or any object with the method draw_polygons)"""
 
-    def __init__(self, max_shading=0.1):
+    def __init__(self, max_shading=0.1, raster='batched'):
         """initiallizes the instance
-        max_shading: float: percentage of the color that is shaded when not directly illuminated"""
+        max_shading: float: percentage of the color that is shaded when not directly illuminated
+        raster: str (one of raster_backends) or raster backend instance"""
         self.max_shading = max_shading
+        self.raster = raster_backends[raster]() if isinstance(raster, str) else raster
 
     def draw(self, screen, arr, colors, edge_colors, shading):
         """
@@ -27,12 +72,7 @@ class Draw:
         edge_colors: numpy array of shape (n, 3) containing rgb edge color codes for n polygons
         returns screen"""
         pcolors = (colors * (1 - self.max_shading) + colors * self.max_shading * shading.reshape(-1, 1)).astype('int16')
-        for polygon, color, edge_color in zip(arr, pcolors, edge_colors):
-            coords = [tuple(node) for node in polygon]
-            color_rgb = tuple(color)
-            edge_color_rgb = tuple(edge_color)
-            pygame.draw.polygon(screen, color_rgb, coords)
-            pygame.draw.polygon(screen, edge_color_rgb, coords, 1)
+        self.raster.draw_polygons(screen, arr, pcolors, edge_colors)
         return screen
 
 if __name__ == '__main__':
@@ -7,6 +7,9 @@ import numpy as np
 import random
 import copy
 import time
+from classes import bitboard
+from classes.lines import get_line_index
+from classes.zobrist import get_zobrist_keys
 
 version = 'engine.v.1.0.0'
 
@@ -31,19 +34,40 @@ class State:
     last_3dplay: tuple of three ints containing the last 3dplay performed
     game_over: bool: True if all the positions of the 3d board are occupied or one of the players have won and False
             otherwise
-    diags: dictionary of lists of lists of 'win' tuples containing 3 ints. The key of the dictionary is a tuple with
-            3 ints (coordinates of a 3dpos). the values are lists of diags (a diag is a list containing 'win'
-            coordinates, which are tuples of three ints). All diags in a list contain the coordinate of the key.
-    history: list of dicts. Each dict contains the history of a turn. The dictionary fields are 'turn', 'play',
-            'play3d', 'offensive_score', 'defensive_score' and 'offensive_diag'
+    line_index: instance of LineIndex: lines of 'win' positions and the lines that cross every position. It is
+            shared (read only) by all the states with the same size and win
+    sinks: list of objects that receive the recorded plays (see classes.record: HistorySink keeps and prints the
+            history of the turns, RecordWriter streams the game to a binary file). A sink has the methods
+            write_play(state, play, play3d) (called before the state is updated), undo_play(state) and
+            end_game(state) (called after the last play of the game)
+    moves: list of tuples of (play, play3d, recorded): plays performed so far (used by undo_play). recorded is
+            True if the play was sent to the sinks
+    changes: int: number of plays run and undone so far (it only grows, so it tells whether the position changed)
     valid_pos: list of tuples with 2 ints: list of all valid plays at this time
     valid_3dpos: list of tuples with 3 ints: list of all valid 3dplays at this time
+    line_counts: numpy array of shape (n, 4) of int32 being n the number of lines in line_index: number of empty
+            positions, of items of player 1, of items of player 2 and of empty and reachable positions in each line.
+            It is updated by run_play only for the lines that cross the play
+    bits: list of two ints: bitmask of the positions of player 1 and player 2 (the bit of a 3d position is
+            bitboard.cell_index). The winner and the end of the game are checked on them
+    bit_tables: tuple of the diags, the bitmasks and the lines crossing each cell of the lines of 'win' positions
+            (bitboard.get_tables, shared by all the states with the same size and win)
+    full_mask: int: bitmask of all the positions of the board
+    hash: int: zobrist hash of the position (items of each player and player that plays next). It is updated by
+            run_play and undo_play
+    zobrist_keys: list of two lists of ints: zobrist key of each cell for each player (shared by all the states)
+    turn_key: int: zobrist key xored when player 2 plays next
+    book: instance of OpeningBook or None: opening book consulted before the score heuristic when run_play has to
+            find the play
     """
 
-    def __init__(self, size=5, win=4, next_turn=1):
+    def __init__(self, size=5, win=4, next_turn=1, seed=None):
         """this method initiallizes the instance
-        size: int: size of the board"""
-        random.seed(time.time())
+        size: int: size of the board
+        win: int: how many items in a row constitute a win of the game
+        next_turn: int (1 or 2): player that plays first
+        seed: int or None: seed of the random choices among equally scored plays (None seeds with the time)"""
+        random.seed(time.time() if seed is None else seed)
         self.size = size
         self.win = win
         self.state = np.zeros((self.size, self.size, self.size)).astype('int8')
@@ -61,53 +85,29 @@ class State:
         self.valid_3dpos = None
         self.get_valid_pos()
         self.game_over = False  # whether game is over or not
-        self.history = []
-        # get the diagonals of size self.win that cross very cell in the 3d board
-        self.diags = dict()
-        diags = []
-        for i in range(self.size):
-            for j in range(self.size):
-                for k in range(self.size):
-                    self.diags[(i, j, k)] = []
-                    diags += self.get_diags(i, j, k)
-        for i in range(self.size):
-            for j in range(self.size):
-                for k in range(self.size):
-                    for diag in diags:
-                        if (i, j, k) in diag:
-                            self.diags[(i, j, k)].append(diag)
-        #for key in self.diags.keys():  # todo eliminate the reformatted version after changes
-            #self.old_diags[key] = [[tuple(diag[i][j] for i in range(self.win)) for j in range(3)] for diag in self.diags[key]]
+        self.sinks = []
+        self.moves = []
+        self.changes = 0
+        self.bits = [0, 0]
+        self.bit_tables = bitboard.get_tables(self.size, self.win)
+        self.full_mask = (1 << self.size ** 3) - 1
+        # index of the lines of size self.win that cross every cell in the 3d board (shared by all the states)
+        self.line_index = get_line_index(self.size, self.win)
+        self.line_counts = np.zeros((len(self.line_index.lines), 4), dtype='int32')
+        self.line_counts[:, 0] = self.win
+        self.line_counts[:, 3] = (self.line_index.lines % self.size == 0).sum(axis=1)  # positions on the floor
+        self.zobrist_keys, self.turn_key = get_zobrist_keys(self.size)
+        self.hash = self.turn_key if self.next_turn == 2 else 0
+        self.book = None
 
     def get_valid_pos(self):
         """updates the valid_pos and valid_3dpos instance attributes
         """
-        self.valid_pos = []
-        self.valid_3dpos = []
-        for i in range(self.size):
-            for j in range(self.size):
-                if self.play[i][j] < self.size:
-                    self.valid_pos.append((i, j))
-                    self.valid_3dpos.append((i, j, self.play[i][j]))
-
-    def get_diags(self, i, j, k):
-        """creates all the diagonals of self.win me"""
-        diags = []
-        diags.append([(i + a, j, k) if i + a < self.size else None for a in range(self.win)])
-        diags.append([(i, j + a, k) if j + a < self.size else None for a in range(self.win)])
-        diags.append([(i, j, k + a) if k + a < self.size else None for a in range(self.win)])
-        diags.append([(i + a, j + a, k) if i + a < self.size and j + a < self.size else None for a in range(self.win)])
-        diags.append([(i + a, j - a, k) if i + a < self.size and j - a > -1 else None for a in range(self.win)])
-        diags.append([(i + a, j, k + a) if i + a < self.size and k + a < self.size else None for a in range(self.win)])
-        diags.append([(i + a, j, k - a) if i + a < self.size and k - a > -1 else None for a in range(self.win)])
-        diags.append([(i, j + a, k + a) if j + a < self.size and k + a < self.size else None for a in range(self.win)])
-        diags.append([(i, j + a, k - a) if j + a < self.size and k - a > -1 else None for a in range(self.win)])
-        diags.append([(i + a, j + a, k + a) if i + a < self.size and j + a < self.size and k + a < self.size else None for a in range(self.win)])
-        diags.append([(i - a, j + a, k + a) if i - a > -1 and j + a < self.size and k + a < self.size else None for a in range(self.win)])
-        diags.append([(i + a, j - a, k + a) if i + a < self.size and j - a > -1 and k + a < self.size else None for a in range(self.win)])
-        diags.append([(i - a, j - a, k + a) if i - a > -1 and j - a > -1 and k + a < self.size else None for a in range(self.win)])
-        diags = [diag for diag in diags if None not in diag]
-        return diags
+        columns = np.flatnonzero(self.play < self.size)
+        i = (columns // self.size).tolist()
+        j = (columns % self.size).tolist()
+        self.valid_pos = list(zip(i, j))
+        self.valid_3dpos = list(zip(i, j, self.play.reshape(-1)[columns].tolist()))
 
     def get_score(self, pos3d):
         """computes the score of playing in position pos for both the next_turn (offensive score) and the
@@ -119,186 +119,114 @@ class State:
                         defensive_score: float
                         num_defensive_score: int
                         best_diag: list of tuples containing 3 ints"""
-        own_score = []
-        other_score = []
-        best_diag = None
-        for diag in self.diags[pos3d]:
-            own_score.append(0.)
-            other_score.append(0.)
-            for item in diag:
-                if item in self.valid_3dpos:  # the position of item is reachable and it is empty
-                    own_score[-1] += 0.5
-                    other_score[-1] += 0.5
-                else:  # the position of item is not reachable but may or may not be empty
-                    if self.next_turn == 1:
-                        if self.pl1[item]:  # the position of item is occupied by the current turn
-                            own_score[-1] += 1  # the position of item is occupied by the current turn
-                            other_score[-1] -= self.win
-                        elif self.pl2[item]:  # the position of item is occupied by the def
-                            own_score[-1] -= self.win
-                            other_score[-1] += 1
-                        else:  # the position of item is not occupied (and it is not reachable either)
-                            own_score[-1] += 0.1
-                            other_score[-1] += 0.1
-                    if self.next_turn == 2:
-                        if self.pl2[item]:  # the position of item is occupied by the current turn
-                            own_score[-1] += 1  # the position of item is occupied by the current turn
-                            other_score[-1] -= self.win
-                        elif self.pl1[item]:  # the position of item is occupied by the def
-                            own_score[-1] -= self.win
-                            other_score[-1] += 1
-                        else:  # the position of item is not occupied (and it is not reachable either)
-                            own_score[-1] += 0.1
-                            other_score[-1] += 0.1
-                if own_score[-1] == max(own_score):
-                    best_diag = [pos for pos in diag]  # make a copy of diag just in case
+        lines = self.line_index.get_lines(bitboard.cell_index(pos3d, self.size))
+        own_score, other_score = self.get_line_scores(self.line_counts[lines])
+        offensive_score = own_score.max()
+        defensive_score = other_score.max()
+        best_diag = self.line_index.get_diag(lines[np.flatnonzero(own_score == offensive_score)[-1]])
+        return float(offensive_score), int((own_score == offensive_score).sum()), \
+            float(defensive_score), int((other_score == defensive_score).sum()), best_diag
+
+    def get_line_scores(self, counts):
+        """computes the score of some lines for the next_turn (own score) and the previous_turn (other score).
+        Each empty and reachable position adds 0.5, each own item adds 1, each item of the other player subtracts
+        win and each empty position that is not reachable adds 0.1. The scores are computed in tenths with ints so
+        that equal scores are always equal floats
+        counts: numpy array of shape (n, 4): rows of line_counts
+        returns: tuple of two numpy arrays of shape (n, ) of floats: own_score and other_score"""
+        base = 5 * counts[:, 3] + counts[:, 0] - counts[:, 3]
+        own = counts[:, self.next_turn]
+        other = counts[:, self.previous_turn]
+        own_score = (base + 10 * own - 10 * self.win * other) / 10.
+        other_score = (base + 10 * other - 10 * self.win * own) / 10.
+        return own_score, other_score
 
-        offensive_score = max(own_score)
-        num_offensive_score = own_score.count(offensive_score)
-        defensive_score = max(other_score)
-        num_defensive_score = other_score.count(defensive_score)
-        return offensive_score, num_offensive_score, defensive_score, num_defensive_score, best_diag
+    def get_scores(self):
+        """computes the same scores as get_score for all the valid plays at once, gathering the counters of the
+        lines crossing the valid 3dplays from the line index
+        returns: scores: tuple of numpy arrays of shape (n, ) being n the number of valid plays:
+                        o_scores: float (offensive score of each valid play)
+                        n_o_scores: int (number of lines giving the offensive score)
+                        d_scores: float (defensive score of each valid play)
+                        n_d_scores: int (number of lines giving the defensive score)"""
+        index = self.line_index
+        columns = np.flatnonzero(self.play < self.size)  # same order as self.valid_pos
+        cells = columns * self.size + self.play.reshape(-1)[columns]
+        # gather the lines crossing each valid 3dplay
+        starts = index.offsets[cells]
+        lengths = index.offsets[cells + 1] - starts
+        segments = np.cumsum(lengths) - lengths  # where the lines of each play start
+        lines = index.cell_lines[np.repeat(starts - segments, lengths) + np.arange(lengths.sum())]
+        own_score, other_score = self.get_line_scores(self.line_counts[lines])
+        o_scores = np.maximum.reduceat(own_score, segments)
+        n_o_scores = np.add.reduceat(own_score == np.repeat(o_scores, lengths), segments)
+        d_scores = np.maximum.reduceat(other_score, segments)
+        n_d_scores = np.add.reduceat(other_score == np.repeat(d_scores, lengths), segments)
+        return o_scores, n_o_scores, d_scores, n_d_scores
 
     def get_best_score_play(self):
-        """gets the play for which the score is the best
+        """gets the play for which the score is the best. Ties are broken by the number of lines giving the score,
+        then by the centrality of the play and finally at random
         returns: chosen_play: tuple of:
                                 play: tuple of two ints
                                 play3d: tuple of three ints
                                 score: float
                                 diag: list of tuples of tree ints
         """
-        # initiallization
-        o_scores = []
-        n_o_scores = []
-        d_scores = []
-        n_d_scores = []
-        diags = []
-        centroid = np.array([(self.size - 1) / 2. for _ in range(3)])
-        # getting list of scores
-        for play, play3d in zip(self.valid_pos, self.valid_3dpos):
-            o_score, n_o_score, d_score, n_d_score, diag = self.get_score(play3d)
-            o_scores.append(o_score)
-            n_o_scores.append(n_o_score)
-            d_scores.append(d_score)
-            n_d_scores.append(n_d_score)
-            diags.append([item for item in diag])
+        o_scores, n_o_scores, d_scores, n_d_scores = self.get_scores()
         # eliminate everything that does not have the max score
-        max_score = max(max(o_scores), max(d_scores))
-        o_indexes = [i for i in range(len(o_scores)) if o_scores[i] == max_score]
-        d_indexes = [i for i in range(len(d_scores)) if d_scores[i] == max_score]
-        o_scores = [o_scores[i] for i in o_indexes]
-        n_o_scores = [n_o_scores[i] for i in o_indexes]
-        diags = [diags[i] for i in o_indexes]
-        o_plays = [self.valid_pos[i] for i in o_indexes]
-        o_plays3d = [self.valid_3dpos[i] for i in o_indexes]
-        d_scores = [d_scores[i] for i in d_indexes]
-        n_d_scores = [n_d_scores[i] for i in d_indexes]
-        d_plays = [self.valid_pos[i] for i in d_indexes]
-        d_plays3d = [self.valid_3dpos[i] for i in d_indexes]
+        max_score = max(o_scores.max(), d_scores.max())
+        o_indexes = np.flatnonzero(o_scores == max_score)
+        d_indexes = np.flatnonzero(d_scores == max_score)
         # Select the play
-        if max_score == self.win - 0.5 and len(o_scores) > 0:  # this play is winner
-            return o_plays[0], o_plays3d[0], o_scores[0], diags[0]
-        if max_score == self.win - 0.5 and len(d_scores) > 0:  # this avoids a winner play
-            return d_plays[0], d_plays3d[0], d_scores[0], None
-        if len(o_scores) == 1 and len(d_scores) == 0:  # will play the best offensive move
-            return o_plays[0], o_plays3d[0], o_scores[0], diags[0]
-        if len(o_scores) == 0 and len(d_scores) == 1:  # will play the best defensive move
-            return d_plays[0], d_plays3d[0], d_scores[0], None
-        if len(o_scores) > 1 and len(d_scores) == 0:  # will play an offensive move but there is more than one
-            # first select based on the number of diags giving the score
-            max_n = max(n_o_scores)
-            o_indexes = [i for i in range(len(n_o_scores)) if n_o_scores[i] == max_n]
-            o_scores = [o_scores[i] for i in o_indexes]
-            n_o_scores = [n_o_scores[i] for i in o_indexes]
-            diags = [diags[i] for i in o_indexes]
-            o_plays = [o_plays[i] for i in o_indexes]
-            o_plays3d = [o_plays3d[i] for i in o_indexes]
-            if len(o_scores) == 1:  # this is the best
-                return o_plays[0], o_plays3d[0], o_scores[0], diags[0]
-            else:  # there is more than one option that tied, chose the one more centered
-                dists = [((np.array(play3d) - centroid) ** 2).sum() for play3d in o_plays3d]
-                mindist = min(dists)
-                o_indexes = [i for i in range(len(dists)) if dists[i] == mindist]
-                o_scores = [o_scores[i] for i in o_indexes]
-                diags = [diags[i] for i in o_indexes]
-                o_plays = [o_plays[i] for i in o_indexes]
-                o_plays3d = [o_plays3d[i] for i in o_indexes]
-                index = random.randrange(len(o_indexes))
-                return o_plays[index], o_plays3d[index], o_scores[index], diags[index]
-        if len(o_scores) == 0 and len(d_scores) > 1:  # we will play an defensive move but there is more than one
-            # first select based on the number of diags giving the score
-            max_n = max(n_d_scores)
-            d_indexes = [i for i in range(len(n_d_scores)) if n_d_scores[i] == max_n]
-            d_scores = [d_scores[i] for i in d_indexes]
-            d_plays = [d_plays[i] for i in d_indexes]
-            d_plays3d = [d_plays3d[i] for i in d_indexes]
-            if len(d_scores) == 1:  # this is the best
-                return d_plays[0], d_plays3d[0], d_scores[0], None
-            else: # there is more than one option that tied, chose the one more centered
-                dists = [((np.array(play3d) - centroid) ** 2).sum() for play3d in d_plays3d]
-                mindist = min(dists)
-                d_indexes = [i for i in range(len(dists)) if dists[i] == mindist]
-                d_scores = [d_scores[i] for i in d_indexes]
-                d_plays = [d_plays[i] for i in d_indexes]
-                d_plays3d = [d_plays3d[i] for i in d_indexes]
-                index = random.randrange(len(d_indexes))
-                return d_plays[index], d_plays3d[index], d_scores[index], None
-        if len(o_scores) > 0 and len(d_scores) > 0:  # there are offensive and defensive scores tied
-            # remove all options that do not have the maximum number of diags giving that score
-            max_n = max(max(n_o_scores), max(n_d_scores))
-            o_indexes = [i for i in range(len(n_o_scores)) if n_o_scores[i] == max_n]
-            d_indexes = [i for i in range(len(n_d_scores)) if n_d_scores[i] == max_n]
-            o_scores = [o_scores[i] for i in o_indexes]
-            n_o_scores = [n_o_scores[i] for i in o_indexes]
-            diags = [diags[i] for i in o_indexes]
-            o_plays = [o_plays[i] for i in o_indexes]
-            o_plays3d = [o_plays3d[i] for i in o_indexes]
-            d_scores = [d_scores[i] for i in d_indexes]
-            n_d_scores = [n_d_scores[i] for i in d_indexes]
-            d_plays = [d_plays[i] for i in d_indexes]
-            d_plays3d = [d_plays3d[i] for i in d_indexes]
-            if len(o_scores) > 0 and len(d_scores) == 0:  # will play an offensive move
-                if len(o_scores) == 1:  # there is only one option
-                    return o_plays[0], o_plays3d[0], o_scores[0], diags[0]
-                else:  # there there is more than one option, chose based on centrality
-                    dists = [((np.array(play3d) - centroid) ** 2).sum() for play3d in o_plays3d]
-                    mindist = min(dists)
-                    o_indexes = [i for i in range(len(dists)) if dists[i] == mindist]
-                    o_scores = [o_scores[i] for i in o_indexes]
-                    diags = [diags[i] for i in o_indexes]
-                    o_plays = [o_plays[i] for i in o_indexes]
-                    o_plays3d = [o_plays3d[i] for i in o_indexes]
-                    index = random.randrange(len(o_indexes))
-                    return o_plays[index], o_plays3d[index], o_scores[index], diags[index]
-            if len(o_scores) == 0 and len(d_scores) > 0:  # will play a defensive move
-                if len(d_scores) == 1:  # we chose this one
-                    return d_plays[0], d_plays3d[0], d_scores[0], None  # diags[0] is useless
-                else:  # there are ties, chose based on centrality
-                    dists = [((np.array(play3d) - centroid) ** 2).sum() for play3d in d_plays3d]
-                    mindist = min(dists)
-                    d_indexes = [i for i in range(len(dists)) if dists[i] == mindist]
-                    d_scores = [d_scores[i] for i in d_indexes]
-                    d_plays = [d_plays[i] for i in d_indexes]
-                    d_plays3d = [d_plays3d[i] for i in d_indexes]
-                    index = random.randrange(len(d_indexes))
-                    return d_plays[index], d_plays3d[index], d_scores[index], None  # diags[0] is useless
-            if len(o_scores) > 0 and len(d_scores) > 0:  # there are ties, play the offensive move
-                if len(o_scores) == 1:  # there is only one option
-                    return o_plays[0], o_plays3d[0], o_scores[0], diags[0]
-                else:  # there there is more than one option, chose based on centrality
-                    dists = [((np.array(play3d) - centroid) ** 2).sum() for play3d in o_plays3d]
-                    mindist = min(dists)
-                    o_indexes = [i for i in range(len(dists)) if dists[i] == mindist]
-                    o_scores = [o_scores[i] for i in o_indexes]
-                    diags = [diags[i] for i in o_indexes]
-                    o_plays = [o_plays[i] for i in o_indexes]
-                    o_plays3d = [o_plays3d[i] for i in o_indexes]
-                    index = random.randrange(len(o_indexes))
-                    return o_plays[index], o_plays3d[index], o_scores[index], diags[index]
-            else:
-                raise(ValueError, 'this should not have happened')
-        else:
-            raise (ValueError, 'this should not have happened')
+        if max_score == self.win - 0.5 and len(o_indexes) > 0:  # this play is winner
+            return self.get_chosen_play(o_indexes[0], o_scores, offensive=True)
+        if max_score == self.win - 0.5:  # this avoids a winner play
+            return self.get_chosen_play(d_indexes[0], d_scores, offensive=False)
+        # remove all options that do not have the maximum number of diags giving that score
+        if len(d_indexes) == 0:
+            o_indexes = o_indexes[n_o_scores[o_indexes] == n_o_scores[o_indexes].max()]
+        elif len(o_indexes) == 0:
+            d_indexes = d_indexes[n_d_scores[d_indexes] == n_d_scores[d_indexes].max()]
+        else:  # there are offensive and defensive scores tied
+            max_n = max(n_o_scores[o_indexes].max(), n_d_scores[d_indexes].max())
+            o_indexes = o_indexes[n_o_scores[o_indexes] == max_n]
+            d_indexes = d_indexes[n_d_scores[d_indexes] == max_n]
+        if len(o_indexes) > 0:  # will play an offensive move (also when tied with defensive moves)
+            return self.get_chosen_play(self.get_centered_index(o_indexes), o_scores, offensive=True)
+        return self.get_chosen_play(self.get_centered_index(d_indexes), d_scores, offensive=False)
+
+    def get_centered_index(self, indexes):
+        """chooses among tied plays the one that is closer to the center of the board (at random if there are
+        still ties)
+        indexes: numpy array of ints: indexes of the tied plays in self.valid_3dpos
+        returns: int: index of the chosen play in self.valid_3dpos"""
+        if len(indexes) == 1:
+            return indexes[0]
+        centroid = (self.size - 1) / 2.
+        dists = ((np.array(self.valid_3dpos)[indexes] - centroid) ** 2).sum(axis=1)
+        indexes = indexes[dists == dists.min()]
+        return indexes[random.randrange(len(indexes))]
+
+    def get_chosen_play(self, index, scores, offensive=True):
+        """builds the chosen play returned by get_best_score_play
+        index: int: index of the play in self.valid_pos
+        scores: numpy array of floats: scores of the valid plays
+        offensive: bool: whether the play is offensive (the diag is only given for offensive plays)
+        returns: chosen_play: tuple of:
+                                play: tuple of two ints
+                                play3d: tuple of three ints
+                                score: float
+                                diag: list of tuples of tree ints or None"""
+        diag = self.get_score(self.valid_3dpos[index])[4] if offensive else None
+        return self.valid_pos[index], self.valid_3dpos[index], float(scores[index]), diag
+
+    def get_book_play(self):
+        """looks the position up in the opening book
+        returns: tuple of two ints or None if there is no book or the position is not in the book"""
+        if self.book is None:
+            return None
+        return self.book.get_play(self)
 
     def get_pl(self):
         """tis method gets the state for each player"""
@@ -309,23 +237,43 @@ class State:
 
     def clone(self):
         """clone the current instance except the children (to make it faster)"""
-        newself = copy.deepcopy(self)
+        newself = self.copy()
         newself.children = []
         return newself
 
-    def run_play(self, play=None):
+    def copy(self):
+        """lightweight copy of the instance: the line index is shared and only the mutable attributes are copied
+        returns: instance of State"""
+        newself = copy.copy(self)
+        for name in ('state', 'play', 'pl1', 'pl2', 'empty', 'line_counts'):
+            setattr(newself, name, getattr(self, name).copy())
+        for name in ('bits', 'valid_pos', 'valid_3dpos', 'moves'):
+            setattr(newself, name, list(getattr(self, name)))
+        newself.sinks = []  # copies are used for searches, their plays are not recorded
+        if self.winning_diag is not None:
+            newself.winning_diag = list(self.winning_diag)
+        return newself
+
+    def run_play(self, play=None, record=True):
         """update a state with a play. If play is none it will find the best play.
         if it is a play it will update the state if the play is valid
         play: tuple of two ints or None
+        record: bool: whether to send the play to the sinks (searches on the state in place skip it and use
+                undo_play to come back)
         returns: success: bool (whether the state was updated or not)"""
         if self.game_over:
             return False
+        if play is None:
+            play = self.get_book_play()
         if play is None:
             play, play3d, score, diag = self.get_best_score_play()
         if self.play[play] >= self.size:  # the play is ilegal
             return False
-        play3d = (play[0], play[1], self.play[play])  # 3d position played
-        offensive_score, num_offensive_score, defensive_score, num_defensive_score, best_diag = self.get_score(play3d)
+        play3d = (play[0], play[1], int(self.play[play]))  # 3d position played
+        record = record and len(self.sinks) > 0
+        if record:
+            for sink in self.sinks:
+                sink.write_play(self, play, play3d)
         self.last_play = play  # last play in this state
         self.last_3dplay = play3d
         self.play[play] += 1  # updates play
@@ -335,17 +283,68 @@ class State:
         else:
             self.pl2[play3d] = 1
         self.empty[play3d] = 0  # update the empty states
+        cell = bitboard.cell_index(play3d, self.size)
+        lines = self.line_index.get_lines(cell)  # update the counters of the lines crossing the play
+        self.line_counts[lines, 0] -= 1
+        self.line_counts[lines, 3] -= 1
+        self.line_counts[lines, self.next_turn] += 1
+        if play3d[2] + 1 < self.size:  # the position above the play becomes reachable
+            self.line_counts[self.line_index.get_lines(cell + 1), 3] += 1
+        self.bits[self.next_turn - 1] |= 1 << cell
+        self.hash ^= self.zobrist_keys[self.next_turn - 1][cell] ^ self.turn_key
         self.next_turn, self.previous_turn = self.previous_turn, self.next_turn  # swaps turns
         self.get_valid_pos()  # updates valid_pos and valid_3dpos
-        if offensive_score == self.win - 0.5:  # updates winner
+        # updates winner with a few AND operations on the bitmasks of the lines crossing the play
+        diags, masks, cell_lines = self.bit_tables
+        line = bitboard.get_winning_line(self.bits[self.previous_turn - 1], cell, masks, cell_lines)
+        if line is not None:
             self.winner = self.previous_turn
-            self.winning_diag = best_diag
+            self.winning_diag = list(diags[line])
         # self.get_winner()  #todo eliminate after testing
-        self.game_over = self.empty.sum() == 0 or self.winner > 0  # updates game over
-        self.history.append({'turn': self.previous_turn, 'play':self.last_play, 'play3d': self.last_3dplay,
-                             'offensive_score': offensive_score, 'defensive_score': defensive_score,
-                             'best_diag': best_diag})
-        print(self.history[-1])
+        self.game_over = (self.bits[0] | self.bits[1]) == self.full_mask or self.winner > 0  # updates game over
+        self.moves.append((play, play3d, record))
+        self.changes += 1
+        if record and self.game_over:
+            for sink in self.sinks:
+                sink.end_game(self)
+        return True
+
+    def undo_play(self):
+        """reverses the last play performed by run_play (the state is left exactly as it was before the play)
+        returns: success: bool (whether there was a play to undo)"""
+        if len(self.moves) == 0:
+            return False
+        play, play3d, recorded = self.moves.pop()
+        player = self.previous_turn
+        self.play[play] -= 1
+        self.state[play3d] = 0
+        if player == 1:
+            self.pl1[play3d] = 0
+        else:
+            self.pl2[play3d] = 0
+        self.empty[play3d] = 1
+        cell = bitboard.cell_index(play3d, self.size)
+        lines = self.line_index.get_lines(cell)
+        self.line_counts[lines, 0] += 1
+        self.line_counts[lines, 3] += 1
+        self.line_counts[lines, player] -= 1
+        if play3d[2] + 1 < self.size:  # the position above the play is not reachable anymore
+            self.line_counts[self.line_index.get_lines(cell + 1), 3] -= 1
+        self.bits[player - 1] &= ~(1 << cell)
+        self.hash ^= self.zobrist_keys[player - 1][cell] ^ self.turn_key
+        self.next_turn, self.previous_turn = self.previous_turn, self.next_turn  # swaps turns
+        self.get_valid_pos()
+        self.winner = 0  # there was no winner before the play, otherwise it could not have been played
+        self.winning_diag = None
+        self.game_over = False
+        if len(self.moves) > 0:
+            self.last_play, self.last_3dplay = self.moves[-1][0], self.moves[-1][1]
+        else:
+            self.last_play, self.last_3dplay = None, None
+        self.changes += 1
+        if recorded:
+            for sink in self.sinks:
+                sink.undo_play(self)
         return True
 
 
@@ -0,0 +1,113 @@
+# -*- coding: utf8 -*-
+# frametimer
+# helper class for cuatro
+# Alfredo Martin 2021
+
+import pygame
+import time
+
+version = 'frametimer.v.1.0.0'
+
+# stages of a frame of the main loop, in the order they are measured
+stages = ('input', 'engine', 'geometry', 'projection', 'raster', 'display')
+
+
+class FrameTimer:
+    """the instance of this class measures the time spent by each stage of the frames of the main loop, shows the
+    averages as an overlay and streams every frame to a csv file. When it is disabled every method returns right
+    away, so it can stay in the main loop
+    instance attributes:
+    enabled: bool: whether the frames are measured
+    overlay: bool: whether the averages are drawn on the screen
+    csv: file object or None: the times of every frame are written to it (in milliseconds)
+    times: dict: the key is each stage and the value the time in seconds spent in the current frame
+    averages: dict: the key is each stage (and 'total') and the value the exponential moving average in seconds
+    frame: int: number of frames measured
+    fps: float: average frames per second
+    t: float: time (time.perf_counter) of the last mark
+    frame_start: float: time (time.perf_counter) at which the current frame started
+    font: pygame font object or None
+    """
+
+    def __init__(self, enabled=False, overlay=True, csv_path=None, smoothing=0.1):
+        """initiallizes the instance
+        enabled: bool: whether the frames are measured
+        overlay: bool: whether the averages are drawn on the screen
+        csv_path: str or None: path of the csv file
+        smoothing: float: weight of the last frame in the moving averages"""
+        self.enabled = enabled
+        self.overlay = overlay
+        self.smoothing = smoothing
+        self.times = {stage: 0. for stage in stages}
+        self.averages = {stage: 0. for stage in stages + ('total', )}
+        self.frame = 0
+        self.fps = 0.
+        self.t = 0.
+        self.frame_start = None
+        self.font = None
+        self.csv = None
+        if enabled and csv_path is not None:
+            self.csv = open(csv_path, 'w')
+            self.csv.write(','.join(('frame', ) + stages + ('total', )) + '\n')
+
+    def start_frame(self):
+        """marks the beginning of a frame"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.fps += self.smoothing * (1. / max(now - self.frame_start, 1e-6) - self.fps)
+        self.frame_start = self.t = now
+        for stage in stages:
+            self.times[stage] = 0.
+
+    def start(self):
+        """marks the beginning of a stage when the time since the last mark must not be counted (a pause)"""
+        if not self.enabled:
+            return
+        self.t = time.perf_counter()
+
+    def stop(self, stage):
+        """adds the time since the last mark to a stage (the next stage starts now)
+        stage: str: one of stages"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.times[stage] += now - self.t
+        self.t = now
+
+    def end_frame(self):
+        """updates the averages and writes the frame to the csv file"""
+        if not self.enabled:
+            return
+        total = sum(self.times.values())
+        for stage in stages:
+            self.averages[stage] += self.smoothing * (self.times[stage] - self.averages[stage])
+        self.averages['total'] += self.smoothing * (total - self.averages['total'])
+        if self.csv is not None:
+            self.csv.write(','.join([str(self.frame)] + ['{:.3f}'.format(1000. * self.times[stage])
+                                                          for stage in stages] + ['{:.3f}'.format(1000. * total)]))
+            self.csv.write('\n')
+        self.frame += 1
+
+    def draw(self, screen):
+        """draws the average times of the stages in the top left corner of the screen
+        screen: pygame screen object"""
+        if not self.enabled or not self.overlay:
+            return
+        if self.font is None:
+            self.font = pygame.font.SysFont('monospace', 16)
+        lines = ['{:>10s} {:6.1f} ms'.format(stage, 1000. * self.averages[stage]) for stage in stages + ('total', )]
+        lines.append('{:>10s} {:6.1f}'.format('fps', self.fps))
+        for i, line in enumerate(lines):
+            screen.blit(self.font.render(line, False, (0, 0, 0)), (5, 5 + 18 * i))
+
+    def close(self):
+        """closes the csv file"""
+        if self.csv is not None:
+            self.csv.close()
+            self.csv = None
+
+
+if __name__ == '__main__':
+    print(version)
@@ -0,0 +1,44 @@
+# -*- coding: utf8 -*-
+# frametracker
+# helper class for cuatro
+# Alfredo Martin 2021
+
+version = 'frametracker.v.1.0.0'
+
+
+class FrameTracker:
+    """the instance of this class tells whether a frame has to be rendered. The key of a frame is made of everything
+    that changes the image (angles of the board, cursor, position of the game and announcements shown). When the key
+    of a frame is the same as the key of the last rendered frame the screen already shows it, so the main loop skips
+    the projection and the drawing
+    instance attributes:
+    key: tuple or None: key of the last rendered frame (None forces the next frame to be rendered)
+    rendered: int: number of frames rendered
+    skipped: int: number of frames skipped
+    """
+
+    def __init__(self):
+        """initiallizes the instance"""
+        self.key = None
+        self.rendered = 0
+        self.skipped = 0
+
+    def changed(self, *key):
+        """compares the key of a frame with the key of the last rendered frame (the key is kept if it changed, so the
+        frame must be rendered when True is returned)
+        key: hashable items that describe the frame
+        returns: bool: whether the frame has to be rendered"""
+        if key == self.key:
+            self.skipped += 1
+            return False
+        self.key = key
+        self.rendered += 1
+        return True
+
+    def invalidate(self):
+        """forces the next frame to be rendered (for instance after something else has been drawn on the screen)"""
+        self.key = None
+
+
+if __name__ == '__main__':
+    print(version)
@@ -7,6 +7,10 @@ import numpy as np
 
 version = 'game.v.1.0.0'
 
+# shift of the 3d position (x, y, height) of the neighbour cube that touches each face of bcube3d (the faces are
+# bottom, top and the four sides)
+face_neighbours = ((0, 0, -1), (0, 0, 1), (-1, 0, 0), (1, 0, 0), (0, 1, 0), (0, -1, 0))
+
 class Game:
     """controls the 3d visualization of the current game state
     instance attributes:
@@ -17,13 +21,28 @@ class Game:
     width: int: measure of the edge oif the cube
     space: int: measure of the distance between the center of the cubes
     bcube3d: numpy array defining a unit cube
-    polygons3d: numpy array defining all the cubes
-    colors3d: numpy array defining the colors of all faces
-    edgecolors3d: numpy array defining the colors of all edges
+    polygons3d: numpy array defining all the cubes (view of the first faces of mesh)
+    colors3d: numpy array defining the colors of all faces (view of the first colors of mesh_colors)
+    edgecolors3d: numpy array defining the colors of all edges (view of the first colors of mesh_edge_colors)
+    mesh: numpy array of shape (6 * size ** 3, 4, 3): preallocated faces of the cubes, one cube is appended for
+            every play (in the order of the plays)
+    mesh_colors: numpy array of shape (6 * size ** 3, 3): preallocated colors of the faces
+    mesh_edge_colors: numpy array of shape (6 * size ** 3, 3): preallocated colors of the edges
+    count: int: number of cubes in the mesh
+    slots: dict: the key is the 3d position of each cube in the mesh and the value its index in the mesh
+    plays: list of tuples of the 3d position and the player of each cube in the mesh (in the order of the mesh)
+    state: instance of State class whose plays are in the mesh
+    changes: int: changes of the state (State.changes) when the mesh was last updated
+    generation: int: it grows every time cubes are removed from the mesh (another game or plays undone), so the
+            copies of the mesh know that they have to copy it again
+    winner: int: winner of the state when the colors were last updated
+    occlusion: bool: whether the faces that touch another cube are hidden (only when the cubes touch, that is when
+            width >= space. Otherwise there is a gap between the cubes through which those faces can be seen)
+    mesh_visible: numpy array of shape (6 * size ** 3, ) of bool: False for the hidden faces
     """
 
     def __init__(self, state=None, width=100, space=200,
-                 colors=((255, 0, 0), (0, 255, 0)), edge_colors=((255, 255, 255), (255, 255, 255))):
+                 colors=((255, 0, 0), (0, 255, 0)), edge_colors=((255, 255, 255), (255, 255, 255)), occlusion=False):
         """state: instance of State class
         offset: list of int: offset in each of the three dimensions
         width: int: width of the checker
@@ -31,7 +50,8 @@ class Game:
         space: int: space: int: space between the center of two adjacent checkers
         state: instance of State class
         colors: tuple of colors for player 1 and player 2
-        edge_colots: tuple of colors for edges in player 1 and player 2"""
+        edge_colots: tuple of colors for edges in player 1 and player 2
+        occlusion: bool: whether the faces that touch another cube are hidden (only if width >= space)"""
         self.colors = colors
         self.winning_colors = tuple(tuple(int(self.colors[i][j] / 2) for j in range(3)) for i in range(2))
         self.edge_colors = edge_colors
@@ -74,37 +94,90 @@ class Game:
         self.polygons3d = None
         self.colors3d = None
         self.edge_colors3d = None
+        self.mesh = np.zeros((6 * self.size ** 3, 4, 3))
+        self.mesh_colors = np.zeros((6 * self.size ** 3, 3), dtype='int64')
+        self.mesh_edge_colors = np.zeros((6 * self.size ** 3, 3), dtype='int64')
+        self.count = 0
+        self.slots = dict()
+        self.plays = []
+        self.state = None
+        self.changes = 0
+        self.generation = 0
+        self.winner = 0
+        self.occlusion = occlusion and width >= space
+        self.mesh_visible = np.ones(6 * self.size ** 3, dtype=bool)
         self.get_polygons3d(state)  # gives value to self.cubes3d
 
 
     def get_polygons3d(self, state):
-        """this method creates the 3d polygons corresponding to the state of the game as long with the corresponding
-        filling colors for each polygon and the color of the edges (both depending on the player they belong to)
+        """this method updates the 3d polygons corresponding to the state of the game as long with the corresponding
+        filling colors for each polygon and the color of the edges (both depending on the player they belong to).
+        Only the plays performed since the last call are added to the mesh (when plays have been undone the cubes are
+        removed from the first play that differs), and the colors of the winning diag are
+        only updated when the state changes, so if nothing has changed the arrays are not touched
         the self.polygons3d is a numpy array of shape (n, 4, 3) being n the number of polygons
         the self.colors3d is a numpy array of shape (n, 3)
         the self.edge_colors3d is a numpy array of shape (n, 3)
         state: instacne of State class"""
-        self.polygons3d = []
-        self.colors3d = []
-        self.edge_colors3d = []
-        for index, player in enumerate(np.nditer(state.state)):
-            if player > 0:
-                index_tuple = np.unravel_index(index, state.state.shape)
-                numpy_tuple = np.array([index_tuple[2], index_tuple[0], self.size - index_tuple[1] - 1])
-                self.polygons3d.append(self.bcube3d + numpy_tuple * self.space)
-                if state.winner > 0:
-                    if index_tuple in state.winning_diag:
-                        self.colors3d.append([self.winning_colors[player - 1] for _ in range(6)])
-                    else:
-                        self.colors3d.append([self.colors[player - 1] for _ in range(6)])
+        if state is not self.state:  # another game
+            self.state = state
+            self.plays = []
+            self.count = 0
+            self.slots = dict()
+            self.winner = 0
+            self.polygons3d = None
+            self.generation += 1
+        elif self.polygons3d is not None and state.changes == self.changes and state.winner == self.winner:
+            return
+        self.changes = state.changes
+        # the cubes are kept as long as the plays are the same (plays may have been undone and others played)
+        kept = 0
+        while kept < min(self.count, len(state.moves)) and \
+                self.plays[kept] == (state.moves[kept][1], int(state.state[state.moves[kept][1]])):
+            kept += 1
+        if kept < self.count:
+            for pos3d, player in self.plays[kept:]:
+                del self.slots[pos3d]
+            del self.plays[kept:]
+            self.count = kept
+            self.generation += 1
+        for play, play3d, recorded in state.moves[self.count:]:
+            self.add_cube(play3d, int(state.state[play3d]))
+        if self.occlusion:
+            self.get_hidden_faces(state)
+        if state.winner != self.winner or state.winner > 0:  # the winning diag may be another one after an undo
+            self.winner = state.winner
+            for pos3d, slot in self.slots.items():
+                player = int(state.state[pos3d])
+                if state.winner > 0 and pos3d in state.winning_diag:
+                    self.mesh_colors[slot:slot + 6] = self.winning_colors[player - 1]
                 else:
-                    self.colors3d.append([self.colors[player - 1] for _ in range(6)])
-                self.edge_colors3d.append([self.edge_colors[player - 1] for _ in range(6)])
-        if len(self.polygons3d) > 0:
-            self.polygons3d = np.concatenate(self.polygons3d, axis=0)
-            self.colors3d = np.array(self.colors3d).reshape(-1, 3)
-            self.edge_colors3d = np.array(self.edge_colors3d).reshape(-1, 3)
+                    self.mesh_colors[slot:slot + 6] = self.colors[player - 1]
+        self.polygons3d = self.mesh[:6 * self.count]
+        self.colors3d = self.mesh_colors[:6 * self.count]
+        self.edge_colors3d = self.mesh_edge_colors[:6 * self.count]
+
+    def add_cube(self, pos3d, player):
+        """appends the cube of a play to the mesh
+        pos3d: tuple of three ints: 3d position of the play
+        player: int (1 or 2): player of the play"""
+        slot = 6 * self.count
+        self.mesh[slot:slot + 6] = self.bcube3d + np.array([pos3d[2], pos3d[0], self.size - pos3d[1] - 1]) * self.space
+        self.mesh_colors[slot:slot + 6] = self.colors[player - 1]
+        self.mesh_edge_colors[slot:slot + 6] = self.edge_colors[player - 1]
+        self.slots[tuple(pos3d)] = slot
+        self.plays.append((tuple(pos3d), player))
+        self.count += 1
 
+    def get_hidden_faces(self, state):
+        """hides the faces of the cubes that touch the face of a neighbour cube (they are covered by it from any point
+        of view because the cubes touch or overlap)
+        state: instance of State class"""
+        occupied = np.pad(state.state > 0, 1, constant_values=False)  # the positions out of the board are empty
+        positions = np.array([pos3d for pos3d, player in self.plays], dtype=int).reshape(-1, 3) + 1
+        for face, shift in enumerate(face_neighbours):
+            neighbours = positions + np.array(shift)
+            self.mesh_visible[face:6 * self.count:6] = ~occupied[neighbours[:, 0], neighbours[:, 1], neighbours[:, 2]]
 
 
 if __name__ == '__main__':
@@ -19,37 +19,69 @@ class Get2dcoords:
     offset: tuple of three ints: offset (displacement in the positve z axis) of the giver 3d coords before being
                 rendered
     screenpos: instance of screenpos class
+    cull: bool: whether the faces turned away from the camera are dropped (the polygons must be the faces of cubes in
+                groups of six)
+    culled: int: number of polygons dropped in the last call
+    distances2: numpy array of shape (k, ): squared distances from the camera to the centroids of the polygons
+                returned by the last call (in the drawing order)
                 """
 
-    def __init__(self, light_pos=(0., 0., 0.), offset=None, screenpos=None):
+    def __init__(self, light_pos=(0., 0., 0.), offset=None, screenpos=None, cull=True):
         """ Initiallizes the instance
         light_pos: position of the light source
         offset: tuple of three iints indicating where to translate the polygons before rendering
-        screenpos: instance of screenpos class"""
+        screenpos: instance of screenpos class
+        cull: bool: whether the faces turned away from the camera are dropped"""
         self.light_pos = np.array(light_pos)
         self.polygons3d = None
         self.rotor = Rotate()
         self.offset = offset
         self.screenpos = screenpos
+        self.cull = cull
+        self.culled = 0
+        self.distances2 = None
 
-    def get_polygons2d(self, polygons3d=None, colors=None, edge_colors=None, angles=None):
-        """gets 2d coords from 3d coords and returns the 2d coords along the colors in the 2d drawing order
+    def get_polygons2d(self, polygons3d=None, colors=None, edge_colors=None, angles=None, visible=None):
+        """gets 2d coords from 3d coords and returns the 2d coords along the colors in the 2d drawing order. Before
+        sorting, the polygons that can not be seen are dropped (back faces if cull is True and the polygons that are
+        not visible)
         polgons3d: numpy array of shape (n, m, 3) with n being the number of polygons and m the number of nodes per polygon
         colors: numpy array of shape (n, 3)
         edge_colors: numpy array of shape (n, 3)
         angles: tuple of three angles (in radians)
-        returns tuple of coordinates, colors, edge_colors and shading factor:
-            coordinates: numpy array of shape (n, m, 2)
-            colors: numpy array of shape (n, 3)
-            edge_colors: numpy array of shape (n, 3)
-            shading: numpy array of shape (n, )"""
+        visible: numpy array of shape (n, ) of bool or None: polygons that may be seen (for instance the ones that
+                are not occluded)
+        returns tuple of coordinates, colors, edge_colors and shading factor (k is the number of polygons left):
+            coordinates: numpy array of shape (k, m, 2)
+            colors: numpy array of shape (k, 3)
+            edge_colors: numpy array of shape (k, 3)
+            shading: numpy array of shape (k, )"""
         # Rotate the polygons
         self.polygons3d = self.rotor.rotate(angles,  arr=polygons3d)
         # translate the poligons
         self.polygons3d += np.array(self.offset).reshape(1, 1, 3)
-        # get the sorting indexing for the polygons
         centroids = self.polygons3d.mean(axis=(1,))
         centroid_vectors = centroids - self.screenpos.c.reshape(1, 3)
+        # culling: a face of a cube is turned away from the camera (and hidden by the cube itself) when its outward
+        # vector (from the center of the cube to the centroid of the face) points away from the camera. The winding of
+        # the faces is not consistent, so the orientation of the normals is taken from the center of the cube
+        keep = None
+        if self.cull:
+            centers = centroids.reshape(-1, 6, 3).mean(axis=1)
+            outward_vectors = centroids - np.repeat(centers, 6, axis=0)
+            keep = (outward_vectors * centroid_vectors).sum(axis=1) < 0.
+        if visible is not None:
+            keep = visible if keep is None else keep & visible
+        self.culled = 0
+        if keep is not None:
+            index = np.flatnonzero(keep)
+            self.culled = len(keep) - len(index)
+            self.polygons3d = self.polygons3d[index]
+            centroids = centroids[index]
+            centroid_vectors = centroid_vectors[index]
+            colors = colors[index]
+            edge_colors = edge_colors[index]
+        # get the sorting indexing for the polygons
         distances2 = (centroid_vectors ** 2).sum(axis=1)
         indexes = np.argsort(-distances2)  # sorting in reverse order
         # calculate shading of each polygon (cosine of angle formed by the vector orthogonal to the surface and the
@@ -68,7 +100,26 @@ class Get2dcoords:
         colors = np.take(colors, indexes, axis=0)
         edge_colors = np.take(edge_colors, indexes, axis=0)
         cosine = np.take(cosine, indexes, axis=0)
+        self.distances2 = np.take(distances2, indexes, axis=0)
         return coords, colors, edge_colors, cosine
 
+    def get_points2d(self, points3d=None, angles=None):
+        """rotates, translates and projects points the same way as the polygons (for instance the centers of the
+        cubes that are drawn as sprites)
+        points3d: numpy array of shape (n, 3)
+        angles: tuple of three angles (in radians)
+        returns tuple of coordinates, squared distances to the camera and scale:
+            coordinates: numpy array of shape (n, 2)
+            distances2: numpy array of shape (n, )
+            scale: numpy array of shape (n, ): size in the screen of an object at each point relative to its size at
+                    the offset (where the scene rotates)
+            """
+        points3d = self.rotor.rotate(angles, arr=points3d) + np.array(self.offset).reshape(1, 3)
+        distances2 = ((points3d - self.screenpos.c.reshape(1, 3)) ** 2).sum(axis=1)
+        depth = self.screenpos.get_depth(np.array(self.offset, dtype=float))
+        scale = np.abs(depth / self.screenpos.get_depth(points3d))
+        coords = self.screenpos.pos(points3d).reshape(-1, 2)
+        return coords, distances2, scale
+
 if __name__ == '__main__':
-    print(verson)
+    print(version)
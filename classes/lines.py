@@ -0,0 +1,88 @@
+# -*- coding: utf8 -*-
+# lines
+# helper class for cuatro
+# Alfredo Martin 2021
+
+import numpy as np
+
+version = 'lines.v.1.0.0'
+
+# directions of the lines of the 3d board (each line is generated only once, from the cell where it starts)
+directions = ((1, 0, 0), (0, 1, 0), (0, 0, 1), (1, 1, 0), (1, -1, 0), (1, 0, 1), (1, 0, -1), (0, 1, 1),
+              (0, 1, -1), (1, 1, 1), (-1, 1, 1), (1, -1, 1), (-1, -1, 1))
+
+# line indexes already built, the key is the tuple (size, win)
+_line_indexes = dict()
+
+
+class LineIndex:
+    """the instance of this class holds all the lines of 'win' cells of a board and a CSR style index from each
+    cell to the lines that cross it. Cells are numbered as the flat index of a (size, size, size) array.
+    The instances are shared by all the states with the same size and win, so the arrays are read only.
+    instance attributes:
+    size: int: size of the board
+    win: int: how many items in a row constitute a win of the game
+    lines: numpy array of shape (n, win) of int32: cells of each of the n lines
+    offsets: numpy array of shape (size ** 3 + 1, ) of int32: the lines crossing cell c are
+            cell_lines[offsets[c]:offsets[c + 1]]
+    cell_lines: numpy array of shape (n * win, ) of int32: indexes of the lines grouped by cell
+    padded_lines: numpy array of shape (size ** 3, m) of int32 being m the maximum number of lines crossing a cell:
+            the lines crossing each cell padded with n (an index past the last line) for vectorized gathers
+    coords: list of tuples of three ints: 3d coordinates of each cell
+    """
+
+    def __init__(self, size=5, win=4):
+        """builds the index (use get_line_index to get the shared instance instead)
+        size: int: size of the board
+        win: int: how many items in a row constitute a win of the game"""
+        self.size = size
+        self.win = win
+        steps = np.arange(win).reshape(1, -1, 1)
+        grid = np.indices((size, size, size)).reshape(3, -1).T  # shape (size ** 3, 3)
+        lines = []
+        for direction in directions:
+            direction = np.array(direction)
+            ends = grid + (win - 1) * direction
+            starts = grid[((ends >= 0) & (ends < size)).all(axis=1)]
+            cells = starts.reshape(-1, 1, 3) + steps * direction.reshape(1, 1, 3)  # shape (n, win, 3)
+            lines.append((cells[:, :, 0] * size + cells[:, :, 1]) * size + cells[:, :, 2])
+        self.lines = np.concatenate(lines, axis=0).astype('int32')
+        cells = self.lines.flatten()
+        order = np.argsort(cells, kind='stable')
+        self.cell_lines = (order // win).astype('int32')
+        self.offsets = np.zeros(size ** 3 + 1, dtype='int32')
+        self.offsets[1:] = np.cumsum(np.bincount(cells, minlength=size ** 3))
+        counts = np.diff(self.offsets)
+        self.padded_lines = np.full((size ** 3, counts.max()), len(self.lines), dtype='int32')
+        self.padded_lines[np.repeat(np.arange(size ** 3), counts),
+                          np.arange(len(cells)) - np.repeat(self.offsets[:-1], counts)] = self.cell_lines
+        for arr in (self.lines, self.cell_lines, self.offsets, self.padded_lines):
+            arr.flags.writeable = False
+        self.coords = [tuple(int(x) for x in pos) for pos in grid]
+
+    def get_lines(self, cell):
+        """returns the indexes of the lines crossing a cell
+        cell: int: flat index of the cell
+        returns: numpy array of int32"""
+        return self.cell_lines[self.offsets[cell]:self.offsets[cell + 1]]
+
+    def get_diag(self, line):
+        """returns the coordinates of the cells of a line
+        line: int: index of the line
+        returns: list of 'win' tuples of three ints"""
+        return [self.coords[cell] for cell in self.lines[line]]
+
+
+def get_line_index(size, win):
+    """returns the shared (read only) instance of LineIndex for the given size and win, building it the first time
+    size: int: size of the board
+    win: int: how many items in a row constitute a win of the game
+    returns: instance of LineIndex"""
+    key = (size, win)
+    if key not in _line_indexes:
+        _line_indexes[key] = LineIndex(size=size, win=win)
+    return _line_indexes[key]
+
+
+if __name__ == '__main__':
+    print(version)
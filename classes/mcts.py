@@ -0,0 +1,236 @@
+# -*- coding: utf8 -*-
+# mcts
+# helper class for cuatro
+# Alfredo Martin 2021
+
+import random
+import math
+import time
+from classes import bitboard
+
+version = 'mcts.v.1.0.0'
+
+
+class Node:
+    """node of the search tree. The plays are identified by their column (i * size + j)
+    instance attributes:
+    parent: instance of Node or None
+    column: int or None: play that leads from the parent to this node
+    player: int (1 or 2): player that made the play that leads to this node
+    winner: int: player that won with the play that leads to this node (0 if none)
+    children: list of instances of Node
+    untried: list of ints: plays that have not been expanded yet
+    visits: int: number of playouts that went through this node
+    wins: float: number of those playouts won by player (draws count 0.5)
+    """
+
+    def __init__(self, parent=None, column=None, player=1, winner=0, untried=None):
+        self.parent = parent
+        self.column = column
+        self.player = player
+        self.winner = winner
+        self.children = []
+        self.untried = [] if untried is None or winner > 0 else untried
+        self.visits = 0
+        self.wins = 0.
+
+    def select(self, exploration):
+        """selects the child with the highest upper confidence bound (UCT)
+        exploration: float: exploration constant
+        returns: instance of Node"""
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: child.wins / child.visits +
+                   exploration * math.sqrt(log_visits / child.visits))
+
+
+def get_bits(state):
+    """returns the bitmasks of both players of a state (a copy, so the playouts can modify them)
+    state: instance of State class
+    returns: list of two ints"""
+    return list(state.bits)
+
+
+def run_play(bits, heights, column, player, size, masks, cell_lines):
+    """performs a play on a lightweight board (bitmasks and column heights)
+    bits: list of two ints: bitmasks of the players (modified in place)
+    heights: bytearray: number of items of each column (modified in place)
+    column: int: column of the play (i * size + j)
+    player: int (1 or 2): player that plays
+    size: int: size of the board
+    masks: list of ints: bitmask of each line
+    cell_lines: list of tuples of ints: indexes of the lines that cross each cell
+    returns: bool: whether the play wins the game"""
+    cell = column * size + heights[column]
+    heights[column] += 1
+    bits[player - 1] |= 1 << cell
+    return bitboard.get_winning_line(bits[player - 1], cell, masks, cell_lines) is not None
+
+
+def playout(bits, heights, player, size, masks, cell_lines, rng, greedy=False):
+    """plays a game at random until the end
+    bits: list of two ints: bitmasks of the players (modified in place)
+    heights: bytearray: number of items of each column (modified in place)
+    player: int (1 or 2): player that plays next
+    size: int: size of the board
+    masks: list of ints: bitmask of each line
+    cell_lines: list of tuples of ints: indexes of the lines that cross each cell
+    rng: instance of random.Random
+    greedy: bool: whether to take a winning play when there is one instead of a random play
+    returns: int: winner of the game (0 if it is a draw)"""
+    free = [column for column in range(size * size) if heights[column] < size]
+    while len(free) > 0:
+        index = None
+        if greedy:  # look for a play that wins right away
+            for i, column in enumerate(free):
+                cell = column * size + heights[column]
+                if bitboard.get_winning_line(bits[player - 1] | (1 << cell), cell, masks, cell_lines) is not None:
+                    index = i
+                    break
+        if index is None:
+            index = rng.randrange(len(free))
+        column = free[index]
+        if run_play(bits, heights, column, player, size, masks, cell_lines):
+            return player
+        if heights[column] == size:  # the column is full
+            free[index] = free[-1]
+            free.pop()
+        player = 3 - player
+    return 0
+
+
+def search_tree(size, win, bits, heights, next_turn, iterations=None, time_limit=1., exploration=1.4,
+                greedy=False, seed=None):
+    """runs a monte carlo tree search from a position. It is a module function so it can run in other processes
+    size: int: size of the board
+    win: int: how many items in a row constitute a win of the game
+    bits: list of two ints: bitmasks of the players
+    heights: bytes: number of items of each column
+    next_turn: int (1 or 2): player that plays next
+    iterations: int or None: maximum number of playouts
+    time_limit: float or None: maximum time in seconds
+    exploration: float: exploration constant of UCT
+    greedy: bool: whether the playouts take the winning plays
+    seed: int or None: seed of the random generator
+    returns: tuple of:
+        stats: dict: the key is the column of each play of the root and the value a list with visits and wins
+        playouts: int: number of playouts performed"""
+    rng = random.Random(seed)
+    lines, masks, cell_lines = bitboard.get_tables(size, win)
+    root = Node(player=3 - next_turn, untried=[column for column in range(size * size) if heights[column] < size])
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    playouts = 0
+    while (iterations is None or playouts < iterations) and (deadline is None or time.perf_counter() < deadline):
+        node = root
+        node_bits = list(bits)
+        node_heights = bytearray(heights)
+        # selection
+        while len(node.untried) == 0 and len(node.children) > 0:
+            node = node.select(exploration)
+            run_play(node_bits, node_heights, node.column, node.player, size, masks, cell_lines)
+        # expansion
+        if len(node.untried) > 0:
+            column = node.untried.pop(rng.randrange(len(node.untried)))
+            player = 3 - node.player
+            won = run_play(node_bits, node_heights, column, player, size, masks, cell_lines)
+            child = Node(parent=node, column=column, player=player, winner=player if won else 0,
+                         untried=[c for c in range(size * size) if node_heights[c] < size])
+            node.children.append(child)
+            node = child
+        # simulation
+        if node.winner > 0:
+            winner = node.winner
+        else:
+            winner = playout(node_bits, node_heights, 3 - node.player, size, masks, cell_lines, rng, greedy)
+        playouts += 1
+        # backpropagation
+        while node is not None:
+            node.visits += 1
+            if winner == node.player:
+                node.wins += 1.
+            elif winner == 0:
+                node.wins += 0.5
+            node = node.parent
+    return {child.column: [child.visits, child.wins] for child in root.children}, playouts
+
+
+class MCTS:
+    """the instance of this class chooses plays with a monte carlo tree search (UCT selection and random playouts
+    on bitboards). With more than one worker the search is parallelized at the root: every worker process builds
+    its own tree and the visits of the plays of the root are merged
+    instance attributes:
+    time_limit: float or None: time in seconds available to choose a play
+    iterations: int or None: number of playouts per worker
+    workers: int: number of processes
+    exploration: float: exploration constant of UCT
+    greedy: bool: whether the playouts take the winning plays
+    rng: instance of random.Random: generator of the seeds of the searches
+    executor: instance of ProcessPoolExecutor or None
+    stats: dict: merged visits and wins of each play of the root in the last search
+    playouts: int: number of playouts of the last search
+    elapsed: float: duration of the last search in seconds
+    playouts_per_second: float: playouts per second of the last search
+    """
+
+    def __init__(self, time_limit=1., iterations=None, workers=1, exploration=1.4, greedy=True, seed=None):
+        """initiallizes the instance
+        time_limit: float or None: time in seconds available to choose a play
+        iterations: int or None: number of playouts per worker (at least one of the budgets has to be given)
+        workers: int: number of processes
+        exploration: float: exploration constant of UCT
+        greedy: bool: whether the playouts take the winning plays
+        seed: int or None: seed of the random generator"""
+        if time_limit is None and iterations is None:
+            raise ValueError('a time limit or a number of iterations is needed')
+        self.time_limit = time_limit
+        self.iterations = iterations
+        self.workers = workers
+        self.exploration = exploration
+        self.greedy = greedy
+        self.rng = random.Random(seed)
+        self.executor = None
+        self.stats = dict()
+        self.playouts = 0
+        self.elapsed = 0.
+        self.playouts_per_second = 0.
+
+    def get_play(self, state):
+        """chooses a play for the player that plays next
+        state: instance of State class (it is not modified)
+        returns: play: tuple of two ints (the play of the score heuristic if no playout could be completed)"""
+        start = time.perf_counter()
+        args = (state.size, state.win, get_bits(state), bytes(state.play.reshape(-1).astype('uint8')),
+                state.next_turn, self.iterations, self.time_limit, self.exploration, self.greedy)
+        seeds = [self.rng.randrange(2 ** 32) for _ in range(self.workers)]
+        if self.workers > 1:
+            if self.executor is None:
+                from concurrent.futures import ProcessPoolExecutor  # imported here: only needed with workers
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            results = [future.result() for future in
+                       [self.executor.submit(search_tree, *args, seed=seed) for seed in seeds]]
+        else:
+            results = [search_tree(*args, seed=seeds[0])]
+        self.stats = dict()
+        self.playouts = 0
+        for stats, playouts in results:
+            self.playouts += playouts
+            for column, (visits, wins) in stats.items():
+                if column not in self.stats:
+                    self.stats[column] = [0, 0.]
+                self.stats[column][0] += visits
+                self.stats[column][1] += wins
+        self.elapsed = time.perf_counter() - start
+        self.playouts_per_second = self.playouts / self.elapsed if self.elapsed > 0 else 0.
+        if self.playouts == 0 or len(self.stats) == 0:  # no playout finished in time: the score heuristic is used
+            return state.get_best_score_play()[0]
+        column = max(self.stats, key=lambda c: (self.stats[c][0], self.stats[c][1]))
+        return divmod(column, state.size)
+
+    def close(self):
+        """shuts the worker processes down"""
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+
+if __name__ == '__main__':
+    print(version)
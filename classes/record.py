@@ -0,0 +1,188 @@
+# -*- coding: utf8 -*-
+# record
+# helper classes for cuatro
+# Alfredo Martin 2021
+
+import os
+import struct
+from classes import bitboard
+from classes.engine import State
+
+version = 'record.v.1.0.0'
+
+# file layout: the magic and the format version, then the games one after the other. Every game is a header
+# (size, win and player that played first) followed by one byte per play (column of the play: x * size + y) and
+# the end byte. Columns are smaller than 255 for boards up to 15 x 15
+magic = b'CUATRORC'
+format_version = 1
+game_header = struct.Struct('<BBB')  # size, win, first player
+end_byte = 255
+
+
+class HistorySink:
+    """sink of the plays of a State that keeps the history of the turns as a list of dicts and prints every turn
+    (the output of the game console)
+    instance attributes:
+    history: list of dicts. Each dict contains the history of a turn. The dictionary fields are 'turn', 'play',
+            'play3d', 'offensive_score', 'defensive_score' and 'best_diag'
+    verbose: bool: whether to print every turn
+    """
+
+    def __init__(self, verbose=True):
+        """initiallizes the instance
+        verbose: bool: whether to print every turn"""
+        self.history = []
+        self.verbose = verbose
+
+    def write_play(self, state, play, play3d):
+        """scores the play (the state has not been updated yet) and appends it to the history
+        state: instance of State class
+        play: tuple of two ints
+        play3d: tuple of three ints"""
+        offensive_score, num_offensive_score, defensive_score, num_defensive_score, best_diag = \
+            state.get_score(play3d)
+        self.history.append({'turn': state.next_turn, 'play': play, 'play3d': play3d,
+                             'offensive_score': offensive_score, 'defensive_score': defensive_score,
+                             'best_diag': best_diag})
+        if self.verbose:
+            print(self.history[-1])
+
+    def undo_play(self, state):
+        """removes the last turn from the history
+        state: instance of State class"""
+        if len(self.history) > 0:
+            self.history.pop()
+
+    def end_game(self, state):
+        """nothing to do at the end of the game
+        state: instance of State class"""
+        pass
+
+
+class RecordWriter:
+    """sink of the plays of a State that streams the games to a binary file (one byte per play). The plays of a game
+    are kept in memory until the game ends (so they can be undone) and then the game is appended to the file
+    instance attributes:
+    f: file object
+    header: bytes or None: header of the game in progress
+    plays: bytearray: columns of the plays of the game in progress
+    games: int: number of games written
+    """
+
+    def __init__(self, path, append=True, size=None):
+        """opens the file
+        path: str: path of the file
+        append: bool: whether to add the games to the file if it exists (otherwise it is overwritten)
+        size: int or None: size of the boards that will be recorded (checked before the file is opened)"""
+        if size is not None and size ** 2 > end_byte:  # a column would be the end byte or would not fit in a byte
+            raise ValueError('boards larger than 15 x 15 can not be recorded (size {})'.format(size))
+        exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            with open(path, 'rb') as f:
+                if f.read(len(magic) + 1) != magic + bytes([format_version]):
+                    raise ValueError(path + ' is not a valid record file')
+        self.f = open(path, 'ab' if exists else 'wb')
+        if not exists:
+            self.f.write(magic + bytes([format_version]))
+        self.header = None
+        self.plays = bytearray()
+        self.games = 0
+
+    def write_play(self, state, play, play3d):
+        """adds a play to the game in progress (a state without plays starts a new game)
+        state: instance of State class (not updated with the play yet)
+        play: tuple of two ints
+        play3d: tuple of three ints"""
+        if len(state.moves) == 0 or self.header is None:
+            self.flush_game()
+            first_turn = state.next_turn if len(state.moves) % 2 == 0 else state.previous_turn
+            self.header = game_header.pack(state.size, state.win, first_turn)
+        self.plays.append(play[0] * state.size + play[1])
+
+    def undo_play(self, state):
+        """removes the last play of the game in progress
+        state: instance of State class"""
+        if len(self.plays) > 0:
+            self.plays.pop()
+
+    def end_game(self, state):
+        """appends the game to the file
+        state: instance of State class"""
+        self.flush_game()
+
+    def flush_game(self):
+        """appends the game in progress (if any) to the file"""
+        if self.header is not None:
+            self.f.write(self.header + bytes(self.plays) + bytes([end_byte]))
+            self.f.flush()
+            self.games += 1
+        self.header = None
+        self.plays = bytearray()
+
+    def close(self):
+        """appends the game in progress (even if it is not over) and closes the file"""
+        self.flush_game()
+        self.f.close()
+
+
+def read_records(path, chunk_size=1 << 16):
+    """reads the games of a record file as they are needed
+    path: str: path of the file
+    chunk_size: int: number of bytes read at once
+    yields: tuple of size, win, first player and list of plays (tuples of two ints)"""
+    with open(path, 'rb') as f:
+        if f.read(len(magic) + 1) != magic + bytes([format_version]):
+            raise ValueError(path + ' is not a valid record file')
+        pending = b''
+        while True:
+            chunk = f.read(chunk_size)
+            if len(chunk) == 0:
+                break
+            games = (pending + chunk).split(bytes([end_byte]))
+            pending = games.pop()  # the last game is not complete yet
+            for game in games:
+                size, win, first_turn = game_header.unpack_from(game)
+                yield size, win, first_turn, [divmod(column, size) for column in game[game_header.size:]]
+        if len(pending) > 0:
+            raise ValueError(path + ' is truncated')
+
+
+def replay_records(path):
+    """replays the games of a record file
+    path: str: path of the file
+    yields: instance of State class: final position of every game"""
+    for size, win, first_turn, plays in read_records(path):
+        state = State(size=size, win=win, next_turn=first_turn, seed=0)
+        for play in plays:
+            if not state.run_play(play, record=False):
+                raise ValueError('ilegal play {} in a record'.format(play))
+        yield state
+
+
+def replay_boards(path):
+    """replays the games of a record file with bitmasks only (much faster than replay_records when the final
+    positions are all that is needed)
+    path: str: path of the file
+    yields: tuple of size, win, first player, list of plays, bitmasks of the items of each player (list of two ints,
+            the bit of a 3d position is bitboard.cell_index) and winner (0 if nobody won)"""
+    for size, win, first_turn, plays in read_records(path):
+        masks, cell_lines = bitboard.get_tables(size, win)[1:]
+        heights = [0] * size ** 2
+        bits = [0, 0]
+        player = first_turn
+        winner = 0
+        for x, y in plays:
+            column = x * size + y
+            if heights[column] >= size or winner > 0:
+                raise ValueError('ilegal play {} in a record'.format((x, y)))
+            cell = column * size + heights[column]
+            heights[column] += 1
+            bits[player - 1] |= 1 << cell
+            if bitboard.get_winning_line(bits[player - 1], cell, masks, cell_lines) is not None:
+                winner = player
+            player = 3 - player
+        yield size, win, first_turn, plays, bits, winner
+
+
+if __name__ == '__main__':
+    print(version)
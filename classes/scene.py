@@ -0,0 +1,91 @@
+# -*- coding: utf8 -*-
+# scene
+# helper class for cuatro
+# Alfredo Martin 2021
+
+import numpy as np
+
+version = 'scene.v.1.0.0'
+
+
+class Scene:
+    """the instance of this class holds the polygons of everything that is shown (cursor, board and stones) in
+    preallocated arrays with fixed slots, so the main loop does not concatenate them every frame. The slots are
+    ordered cursor, board and stones so every combination that is shown is a contiguous view:
+    cursor + board + stones, board + stones and cursor + board
+    instance attributes:
+    polygons3d: numpy array of shape (6 + n_board + 6 * size ** 3, 4, 3): polygons of the scene
+    colors3d: numpy array of shape (6 + n_board + 6 * size ** 3, 3): colors of the polygons
+    edge_colors3d: numpy array of shape (6 + n_board + 6 * size ** 3, 3): colors of the edges
+    visible3d: numpy array of shape (6 + n_board + 6 * size ** 3, ) of bool: False for the polygons that are hidden
+            (occluded stones)
+    board_end: int: index of the first polygon after the board (the stones start there)
+    game: instance of Game class whose stones are in the scene
+    count: int: number of cubes of game copied to the scene
+    generation: int: generation of the mesh of game when it was copied
+    winner: int: winner of the game when its colors were copied
+    """
+
+    def __init__(self, board=None, size=5):
+        """builds the buffers and copies the board (it does not change)
+        board: instance of Board class
+        size: int: size of the board"""
+        self.board_end = 6 + len(board.polygons3d)
+        n = self.board_end + 6 * size ** 3
+        self.polygons3d = np.zeros((n, 4, 3))
+        self.colors3d = np.zeros((n, 3), dtype='int64')
+        self.edge_colors3d = np.zeros((n, 3), dtype='int64')
+        self.visible3d = np.ones(n, dtype=bool)
+        self.polygons3d[6:self.board_end] = board.polygons3d
+        self.colors3d[6:self.board_end] = board.colors3d
+        self.edge_colors3d[6:self.board_end] = board.edge_colors3d
+        self.game = None
+        self.count = 0
+        self.generation = 0
+        self.winner = 0
+
+    def update(self, game=None, cursor=None):
+        """copies what has changed in the stones and the cursor into their slots
+        game: instance of Game class (get_polygons3d already called) or None
+        cursor: instance of Cursor class (get_polygons3d already called) or None"""
+        if game is not None:
+            if game is not self.game or game.generation != self.generation or game.winner != self.winner:
+                self.game = game
+                self.count = 0  # everything is copied again
+                self.generation = game.generation
+                self.winner = game.winner
+            if game.count > self.count:
+                start = self.board_end + 6 * self.count
+                end = self.board_end + 6 * game.count
+                self.polygons3d[start:end] = game.mesh[6 * self.count:6 * game.count]
+                self.colors3d[start:end] = game.mesh_colors[6 * self.count:6 * game.count]
+                self.edge_colors3d[start:end] = game.mesh_edge_colors[6 * self.count:6 * game.count]
+                # a new stone can enclose the previous ones, so the visibility of all of them is copied
+                self.visible3d[self.board_end:end] = game.mesh_visible[:6 * game.count]
+                self.count = game.count
+        if cursor is not None:
+            self.polygons3d[:6] = cursor.polygons3d
+            self.colors3d[:6] = cursor.colors3d
+            self.edge_colors3d[:6] = cursor.edge_colors3d
+
+    def get_polygons3d(self, stones=True, cursor=True):
+        """returns the polygons to show (the board is always shown)
+        stones: bool: whether to show the stones
+        cursor: bool: whether to show the cursor
+        returns: tuple of views of polygons3d, colors3d and edge_colors3d"""
+        start = 0 if cursor else 6
+        end = self.board_end + 6 * self.count if stones else self.board_end
+        return self.polygons3d[start:end], self.colors3d[start:end], self.edge_colors3d[start:end]
+
+    def get_visible3d(self, stones=True, cursor=True):
+        """returns which of the polygons returned by get_polygons3d may be seen
+        stones: bool: whether to show the stones
+        cursor: bool: whether to show the cursor
+        returns: view of visible3d"""
+        start = 0 if cursor else 6
+        end = self.board_end + 6 * self.count if stones else self.board_end
+        return self.visible3d[start:end]
+
+
+if __name__ == '__main__':
+    print(version)
@@ -80,5 +80,15 @@ class ScreenPos:
         b = self.offset + b
         return b
 
+    def get_depth(self, arr=None):
+        """returns the homogeneous coordinate of the projection of some points (pos divides by it, so the size of an
+        object in the screen is inversely proportional to its absolute value)
+        arr: numpy array of shape (n, 3)
+        returns: numpy array of shape (n, )"""
+        d = arr.reshape(-1, 3) - self.c.reshape(1, 3)
+        if self.rotate_camera:
+            d = np.matmul(d, self.rot)
+        return np.matmul(d, self.e[:3, 3]) + self.e[3, 3]
+
 if __name__ == '__main__':
     print(version)
@@ -0,0 +1,235 @@
+# -*- coding: utf8 -*-
+# search
+# helper class for cuatro
+# Alfredo Martin 2021
+
+import numpy as np
+import time
+from classes.transposition import TranspositionTable, EXACT, LOWER, UPPER
+from classes.symmetry import get_canonical_hash, transform_play, inverse_play
+from classes.threats import find_forced_win, get_forced_blocks, get_winning_plays
+
+version = 'search.v.1.0.0'
+
+
+class AlphaBeta:
+    """the instance of this class chooses plays with a negamax search with alpha-beta pruning and iterative
+    deepening. The plays are ordered with the scores of State.get_scores and the search stops when the time limit
+    is reached, returning the best play of the deepest iteration that was completed
+    instance attributes:
+    time_limit: float: time in seconds available to choose a play
+    max_depth: int: maximum depth of the iterative deepening
+    win_score: int: score of a won position (reduced by the number of plays needed to win)
+    weights: numpy array of ints: value of a line with no items of the other player given the number of own items
+    deadline: float: time (time.perf_counter) at which the current search has to stop
+    stopped: bool: whether the current search ran out of time
+    nodes: int: number of nodes visited in the last search
+    depth: int: depth of the last completed iteration
+    score: int: score of the best play found in the last completed iteration
+    table: instance of TranspositionTable or None: results of the searches keyed by the hash of the positions
+    symmetric: bool: whether the table is keyed by the canonical hash so equivalent positions share entries
+    threat_plies: int: maximum length of the forced wins looked for with the threat space search before the
+            general search (0 disables it)
+    forced_line: list of tuples of two ints or None: forced win found by the threat space search in the last search
+    """
+
+    def __init__(self, time_limit=0.5, max_depth=64, table_mb=16, symmetric=False, threat_plies=7):
+        """initiallizes the instance
+        time_limit: float: time in seconds available to choose a play
+        max_depth: int: maximum depth of the iterative deepening
+        table_mb: float: memory of the transposition table in MB (0 disables the table)
+        symmetric: bool: whether to key the table with the canonical hash of the positions
+        threat_plies: int: maximum length of the forced wins of the threat space search (0 disables it)"""
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.table = TranspositionTable(mb=table_mb) if table_mb > 0 else None
+        self.symmetric = symmetric
+        self.threat_plies = threat_plies
+        self.forced_line = None
+        self.win_score = 1000000
+        self.weights = None
+        self.deadline = None
+        self.stopped = False
+        self.nodes = 0
+        self.depth = 0
+        self.score = 0
+
+    def evaluate(self, state):
+        """evaluates a position from the point of view of the player that plays next using the line counters of
+        the state: every line that is still open for a player adds a weight that grows with its number of items and
+        with its number of reachable positions. If the player that plays next has a winning play it is almost a win
+        state: instance of State class
+        returns: int"""
+        if self.weights is None or len(self.weights) != state.win + 1:
+            self.weights = 4 ** np.arange(state.win + 1)
+            self.weights[0] = 0
+        own = state.line_counts[:, state.next_turn]
+        other = state.line_counts[:, state.previous_turn]
+        reach = state.line_counts[:, 3]
+        if ((own == state.win - 1) & (other == 0) & (reach == 1)).any():  # there is a winning play
+            return self.win_score // 2
+        return int((self.weights[own] * (1 + reach))[other == 0].sum() -
+                   (self.weights[other] * (1 + reach))[own == 0].sum())
+
+    def get_ordered_plays(self, state, first=None):
+        """sorts the valid plays of a state from the most to the least promising one according to their scores
+        state: instance of State class
+        first: tuple of two ints or None: play to be searched first (the best play of the previous iteration)
+        returns: list of tuples of two ints"""
+        o_scores, n_o_scores, d_scores, n_d_scores = state.get_scores()
+        keys = np.maximum(o_scores, d_scores) * 100 + np.maximum(n_o_scores, n_d_scores)
+        plays = [state.valid_pos[i] for i in np.argsort(-keys, kind='stable')]
+        if first is not None and first in plays:
+            plays.remove(first)
+            plays.insert(0, first)
+        return plays
+
+    def negamax(self, state, depth, alpha, beta, ply):
+        """negamax search with alpha-beta pruning. The state is modified in place and restored with undo_play
+        state: instance of State class
+        depth: int: remaining depth
+        alpha: int: lower bound
+        beta: int: upper bound
+        ply: int: number of plays from the root
+        returns: int: score of the position for the player that plays next"""
+        self.nodes += 1
+        if time.perf_counter() > self.deadline:
+            self.stopped = True
+        if self.stopped:
+            return 0
+        if state.winner > 0:  # the previous play won the game
+            return -(self.win_score - ply)
+        if state.game_over:
+            return 0
+        if depth == 0:
+            return self.evaluate(state)
+        first = None
+        if self.table is not None:
+            if self.symmetric:  # the moves in the table are moves of the canonical position
+                key, transform = get_canonical_hash(state)
+            else:
+                key, transform = state.hash, 0
+            entry = self.table.probe(key)
+            if entry is not None:
+                entry_depth, flag, score, move = entry
+                score = self.from_table(score, ply)
+                if entry_depth >= depth:
+                    if flag == EXACT:
+                        return score
+                    if flag == LOWER and score >= beta:
+                        return score
+                    if flag == UPPER and score <= alpha:
+                        return score
+                if move >= 0:
+                    first = inverse_play(divmod(move, state.size), transform, state.size)
+        alpha0 = alpha
+        best = -self.win_score - 1
+        best_play = None
+        for play in self.get_ordered_plays(state, first=first):
+            state.run_play(play, record=False)
+            score = -self.negamax(state, depth - 1, -beta, -alpha, ply + 1)
+            state.undo_play()
+            if self.stopped:
+                return 0
+            if score > best:
+                best = score
+                best_play = play
+            if best > alpha:
+                alpha = best
+            if alpha >= beta:
+                break
+        if self.table is not None:
+            if best <= alpha0:
+                flag = UPPER
+            elif best >= beta:
+                flag = LOWER
+            else:
+                flag = EXACT
+            move = transform_play(best_play, transform, state.size)
+            self.table.store(key, depth, flag, self.to_table(best, ply), move[0] * state.size + move[1])
+        return best
+
+    def to_table(self, score, ply):
+        """converts a score relative to the root into a score relative to the position (wins are stored as
+        the number of plays needed from the position to win)
+        score: int: score relative to the root
+        ply: int: number of plays from the root
+        returns: int"""
+        if score > self.win_score - 1000:
+            return score + ply
+        if score < -self.win_score + 1000:
+            return score - ply
+        return score
+
+    def from_table(self, score, ply):
+        """converts a score stored in the table into a score relative to the root (inverse of to_table)
+        score: int: score relative to the position
+        ply: int: number of plays from the root
+        returns: int"""
+        if score > self.win_score - 1000:
+            return score - ply
+        if score < -self.win_score + 1000:
+            return score + ply
+        return score
+
+    def search_root(self, state, depth, first):
+        """searches all the plays of the root position to a given depth
+        state: instance of State class
+        depth: int: depth of the search
+        first: tuple of two ints or None: play to be searched first
+        returns: tuple of best play (tuple of two ints) and its score (int), or None if the search ran out of time"""
+        alpha = -self.win_score - 1
+        best_play = None
+        for play in self.get_ordered_plays(state, first=first):
+            state.run_play(play, record=False)
+            score = -self.negamax(state, depth - 1, -self.win_score - 1, -alpha, 1)
+            state.undo_play()
+            if self.stopped:
+                return None
+            if best_play is None or score > alpha:
+                alpha = score
+                best_play = play
+        return best_play, alpha
+
+    def stop(self):
+        """makes the search in progress (in another thread) stop at its next check of the time and return the best
+        play found so far (a threat space search in progress ends within its own time slice)"""
+        self.deadline = 0.
+
+    def get_play(self, state):
+        """chooses a play for the player that plays next
+        state: instance of State class (it is searched on a copy, so it is not modified)
+        returns: play: tuple of two ints"""
+        self.deadline = time.perf_counter() + self.time_limit
+        self.stopped = False
+        self.nodes = 0
+        self.depth = 0
+        self.forced_line = None
+        if self.threat_plies > 0:  # forced wins made of threats are found much faster than with the search
+            self.forced_line = find_forced_win(state, max_plies=self.threat_plies, time_limit=self.time_limit / 4)
+            if self.forced_line is not None:
+                return self.forced_line[0]
+        wins = get_winning_plays(state, state.next_turn)
+        if len(wins) > 0:  # a win right away comes before blocking the opponent
+            return wins[0]
+        blocks = get_forced_blocks(state)
+        if len(blocks) == 1:  # there is only one play that does not lose right away
+            return blocks[0]
+        if self.table is not None:
+            self.table.new_search()
+        state = state.copy()
+        best_play = self.get_ordered_plays(state)[0]  # fallback if not even depth 1 can be completed
+        self.score = 0
+        for depth in range(1, self.max_depth + 1):
+            result = self.search_root(state, depth, best_play)
+            if result is None:
+                break
+            best_play, self.score = result
+            self.depth = depth
+            if abs(self.score) > self.win_score - self.max_depth or depth >= state.empty.sum():
+                break  # the result of the game is known or the whole game has been searched
+        return best_play
+
+
+if __name__ == '__main__':
+    print(version)
@@ -0,0 +1,133 @@
+# -*- coding: utf8 -*-
+# sprites
+# helper class for cuatro
+# Alfredo Martin 2021
+
+import pygame
+import numpy as np
+from collections import OrderedDict
+
+version = 'sprites.v.1.0.0'
+
+
+class SpriteDraw:
+    """the instance of this class draws the stones as blits of pre-rendered cube sprites instead of six polygons
+    each. A sprite is a cube rendered (with the projection, culling and shading of the polygons) at the point where
+    the scene rotates, for the colors of a stone and the angles rounded to angle_step. Every stone is blitted at the
+    projection of its center, with the sprite scaled by its distance to the camera. The board and the cursor are
+    still drawn as polygons, merged with the stones in depth order. The perspective and the shading of a stone are
+    those of the point where the scene rotates, so the image is an approximation of the one drawn with polygons
+    The sprites are kept in a cache that drops the least recently used one when it is full, so the time of a frame
+    depends mostly on the number of stones
+    instance attributes:
+    cube3d: numpy array of shape (6, 4, 3): faces of a cube centered in the origin
+    angle_step: float: step in radians of the angles of the sprites
+    scale_step: float: step of the scale of the sprites
+    max_sprites: int: maximum number of sprites in the cache
+    cache: OrderedDict: the key is a tuple of the colors, the rounded angles and the rounded scale of a sprite and
+            the value a tuple of the sprite (pygame surface) and the position of the center of the cube in it
+    hits: int: number of sprites taken from the cache
+    misses: int: number of sprites rendered
+    """
+
+    def __init__(self, cube3d=None, angle_step=0.05, scale_step=0.05, max_sprites=256):
+        """initiallizes the instance
+        cube3d: numpy array of shape (6, 4, 3): faces of the cube of a stone (bcube3d of the Game instance)
+        angle_step: float: step in radians of the angles of the sprites (the controller moves the board in steps
+                of 0.05)
+        scale_step: float: step of the scale of the sprites
+        max_sprites: int: maximum number of sprites in the cache"""
+        self.cube3d = cube3d - cube3d.reshape(-1, 3).mean(axis=0).reshape(1, 1, 3)
+        self.angle_step = angle_step
+        self.scale_step = scale_step
+        self.max_sprites = max_sprites
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_sprite(self, color, edge_color, angles, scale, get2dcoords=None, drawer=None):
+        """returns the sprite of a cube from the cache (it is rendered if it is not there)
+        color: tuple of three ints: color of the faces
+        edge_color: tuple of three ints: color of the edges
+        angles: tuple of three ints: angles in steps of angle_step
+        scale: int: scale in steps of scale_step
+        get2dcoords: instance of Get2dcoords class
+        drawer: instance of Draw class
+        returns: tuple of the sprite (pygame surface) and the position of the center of the cube in it (tuple of two
+                ints)"""
+        key = (color, edge_color, angles, scale)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return self.cache[key]
+        self.misses += 1
+        base_key = (color, edge_color, angles, None)
+        if base_key not in self.cache:  # the sprite at the scale of the point where the scene rotates
+            coords, colors, edge_colors, shading = get2dcoords.get_polygons2d(
+                polygons3d=self.cube3d, colors=np.array([color] * 6), edge_colors=np.array([edge_color] * 6),
+                angles=tuple(angle * self.angle_step for angle in angles))
+            center = get2dcoords.screenpos.pos(np.array(get2dcoords.offset, dtype=float)).reshape(2)
+            corner = coords.reshape(-1, 2).min(axis=0)
+            width, height = coords.reshape(-1, 2).max(axis=0) - corner + 1
+            surface = pygame.Surface((int(width), int(height)), pygame.SRCALPHA)
+            drawer.draw(surface, coords - corner.reshape(1, 1, 2), colors, edge_colors, shading)
+            self.add(base_key, (surface, tuple(int(x) for x in center - corner)))
+        else:
+            self.cache.move_to_end(base_key)
+        surface, center = self.cache[base_key]
+        factor = scale * self.scale_step
+        size = (max(1, int(round(surface.get_width() * factor))), max(1, int(round(surface.get_height() * factor))))
+        sprite = (pygame.transform.smoothscale(surface, size), (int(center[0] * factor), int(center[1] * factor)))
+        self.add(key, sprite)
+        return sprite
+
+    def add(self, key, sprite):
+        """adds a sprite to the cache, dropping the least recently used ones if it is full
+        key: tuple: key of the sprite
+        sprite: tuple of the sprite (pygame surface) and the position of the center of the cube in it"""
+        self.cache[key] = sprite
+        while len(self.cache) > self.max_sprites:
+            self.cache.popitem(last=False)
+
+    def draw(self, screen, scene=None, game=None, get2dcoords=None, drawer=None, angles=None, cursor=True):
+        """draws the board and the cursor as polygons and the stones as sprites, from the farthest to the nearest
+        screen: pygame screen object
+        scene: instance of Scene class (update already called)
+        game: instance of Game class (get_polygons3d already called)
+        get2dcoords: instance of Get2dcoords class
+        drawer: instance of Draw class
+        angles: tuple of three angles (in radians)
+        cursor: bool: whether to show the cursor
+        returns screen"""
+        polygons3d, colors, edge_colors = scene.get_polygons3d(stones=False, cursor=cursor)
+        coords, colors, edge_colors, shading = get2dcoords.get_polygons2d(polygons3d=polygons3d,
+                                                                          colors=colors,
+                                                                          edge_colors=edge_colors,
+                                                                          angles=angles)
+        distances2 = get2dcoords.distances2
+        n = game.count
+        visible = game.mesh_visible[:6 * n].reshape(n, 6).any(axis=1)  # stones with all their faces hidden are skipped
+        centers3d = game.mesh[:6 * n].reshape(n, 24, 3).mean(axis=1)[visible]
+        stone_colors = game.mesh_colors[:6 * n:6][visible].tolist()
+        stone_edge_colors = game.mesh_edge_colors[:6 * n:6][visible].tolist()
+        centers, stone_distances2, scales = get2dcoords.get_points2d(points3d=centers3d, angles=angles)
+        rounded_angles = tuple(int(round(angle / self.angle_step)) for angle in angles)
+        rounded_scales = np.maximum(1, np.round(scales / self.scale_step)).astype(int).tolist()
+        order = np.argsort(-stone_distances2)
+        # number of polygons farther than each stone (they are drawn before it)
+        positions = np.searchsorted(-distances2, -stone_distances2[order])
+        start = 0
+        for i, position in zip(order.tolist(), positions.tolist()):
+            if position > start:
+                drawer.draw(screen, coords[start:position], colors[start:position], edge_colors[start:position],
+                            shading[start:position])
+                start = position
+            sprite, center = self.get_sprite(tuple(stone_colors[i]), tuple(stone_edge_colors[i]), rounded_angles,
+                                             rounded_scales[i], get2dcoords=get2dcoords, drawer=drawer)
+            screen.blit(sprite, (int(centers[i, 0]) - center[0], int(centers[i, 1]) - center[1]))
+        drawer.draw(screen, coords[start:], colors[start:], edge_colors[start:], shading[start:])
+        return screen
+
+
+if __name__ == '__main__':
+    print(version)
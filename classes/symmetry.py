@@ -0,0 +1,109 @@
+# -*- coding: utf8 -*-
+# symmetry
+# helper functions for cuatro
+# Alfredo Martin 2021
+
+import numpy as np
+from classes.zobrist import get_zobrist_keys
+
+version = 'symmetry.v.1.0.0'
+
+# the 8 transforms of the square grid of columns (rotations and reflections of the (i, j) plane). Each one maps
+# (i, j) to (a * i + b * j + c, d * i + e * j + f) with c and f multiplied by size - 1. Gravity (third coordinate)
+# is never transformed. transforms[0] is the identity
+transforms = ((1, 0, 0, 0, 1, 0), (0, 1, 0, -1, 0, 1), (-1, 0, 1, 0, -1, 1), (0, -1, 1, 1, 0, 0),
+              (1, 0, 0, 0, -1, 1), (-1, 0, 1, 0, 1, 0), (0, 1, 0, 1, 0, 0), (0, -1, 1, -1, 0, 1))
+
+# tables already built, the key is the size of the board
+_tables = dict()
+
+
+def transform_play(play, transform, size):
+    """applies a transform to a play
+    play: tuple of two ints
+    transform: int: index of the transform in transforms
+    size: int: size of the board
+    returns: tuple of two ints"""
+    a, b, c, d, e, f = transforms[transform]
+    i, j = play
+    return a * i + b * j + c * (size - 1), d * i + e * j + f * (size - 1)
+
+
+def inverse_play(play, transform, size):
+    """applies the inverse of a transform to a play (inverse_play(transform_play(play, t, s), t, s) == play)
+    play: tuple of two ints
+    transform: int: index of the transform in transforms
+    size: int: size of the board
+    returns: tuple of two ints"""
+    return get_tables(size)[2][transform][play]
+
+
+def get_tables(size):
+    """returns the (shared) tables used to transform the positions of a board of the given size
+    size: int: size of the board
+    returns: tuple of:
+        cells: numpy array of shape (8, size ** 3) of ints: flat index of the cell where each cell goes with each
+                transform
+        keys: numpy array of shape (2, size ** 3) of uint64: zobrist keys of the cells for each player
+        inverse: list of 8 dicts: play of the original position for each play of the transformed position"""
+    if size not in _tables:
+        plays = [(i, j) for i in range(size) for j in range(size)]
+        cells = np.zeros((len(transforms), size ** 3), dtype='int64')
+        inverse = []
+        k = np.arange(size)
+        for t in range(len(transforms)):
+            inverse.append(dict())
+            for i, j in plays:
+                ti, tj = transform_play((i, j), t, size)
+                cells[t, (i * size + j) * size + k] = (ti * size + tj) * size + k
+                inverse[t][(ti, tj)] = (i, j)
+        keys, turn_key = get_zobrist_keys(size)
+        _tables[size] = (cells, np.array(keys, dtype='uint64'), inverse)
+    return _tables[size]
+
+
+def get_hashes(state):
+    """computes the zobrist hash of the 8 transforms of a position
+    state: instance of State class
+    returns: numpy array of shape (8, ) of uint64 (the first one is state.hash)"""
+    cells, keys, inverse = get_tables(state.size)
+    flat = state.state.reshape(-1)
+    hashes = np.full(len(transforms), state.turn_key if state.next_turn == 2 else 0, dtype='uint64')
+    for player in (1, 2):
+        occupied = np.flatnonzero(flat == player)
+        if len(occupied) > 0:
+            hashes ^= np.bitwise_xor.reduce(keys[player - 1][cells[:, occupied]], axis=1)
+    return hashes
+
+
+def get_canonical_hash(state):
+    """computes the canonical hash of a position: the minimum hash of its 8 transforms. Equivalent positions
+    have the same canonical hash
+    state: instance of State class
+    returns: tuple of:
+        hash: int: canonical hash
+        transform: int: index of the transform that gives the canonical position (a play of the position is the
+                play transform_play(play, transform, size) of the canonical position)"""
+    hashes = get_hashes(state)
+    transform = int(np.argmin(hashes))
+    return int(hashes[transform]), transform
+
+
+def get_canonical_encoding(state):
+    """computes the canonical encoding of a position: the minimum (as bytes) of the encodings of its 8 transforms.
+    The encoding is the player that plays next followed by the state of every cell, so unlike the hash it can not
+    collide
+    state: instance of State class
+    returns: tuple of:
+        encoding: bytes
+        transform: int: index of the transform that gives the canonical position"""
+    cells, keys, inverse = get_tables(state.size)
+    transformed = np.zeros((len(transforms), state.size ** 3), dtype='int8')
+    np.put_along_axis(transformed, cells, np.broadcast_to(state.state.reshape(1, -1), transformed.shape), axis=1)
+    encodings = [bytes([state.next_turn]) + row.tobytes() for row in transformed]
+    transform = min(range(len(transforms)), key=lambda t: encodings[t])
+    return encodings[transform], transform
+
+
+if __name__ == '__main__':
+    print(version)
@@ -0,0 +1,91 @@
+# -*- coding: utf8 -*-
+# threats
+# helper functions for cuatro
+# Alfredo Martin 2021
+
+import numpy as np
+import time
+
+version = 'threats.v.1.0.0'
+
+
+def get_threats(state, player):
+    """finds the empty positions that would complete a line of a player (the position may not be reachable yet)
+    state: instance of State class
+    player: int (1 or 2)
+    returns: numpy array of ints: flat indexes of the positions (sorted, without repetitions)"""
+    counts = state.line_counts
+    lines = np.flatnonzero((counts[:, player] == state.win - 1) & (counts[:, 0] == 1))
+    cells = state.line_index.lines[lines]
+    return np.unique(cells[state.state.reshape(-1)[cells] == 0])
+
+
+def get_winning_plays(state, player):
+    """finds the plays that would win the game right away for a player: threats whose position is reachable
+    state: instance of State class
+    player: int (1 or 2)
+    returns: list of tuples of two ints"""
+    cells = get_threats(state, player)
+    columns = cells // state.size
+    columns = columns[state.play.reshape(-1)[columns] == cells % state.size]
+    return [divmod(int(column), state.size) for column in columns]
+
+
+def get_forced_blocks(state):
+    """finds the plays that the player that plays next has to make to avoid losing right away
+    state: instance of State class
+    returns: list of tuples of two ints (more than one means that the game is lost unless it is won first)"""
+    return get_winning_plays(state, state.previous_turn)
+
+
+def attack(state, attacker, plies, deadline):
+    """threat space search: only plays that create a winning play for the attacker are tried, so the replies of the
+    defender are forced (it has to block the winning play or it loses). Gravity is taken into account because the
+    winning plays are recomputed after every play (a block can make the position above it reachable)
+    state: instance of State class with the attacker to play (modified in place and restored)
+    attacker: int (1 or 2)
+    plies: int: maximum number of plies of the winning sequence
+    deadline: float or None: time (time.perf_counter) to give up
+    returns: list of tuples of two ints (the winning sequence with the forced replies) or None"""
+    wins = get_winning_plays(state, attacker)
+    if len(wins) > 0:
+        return [wins[0]]
+    if plies < 3 or (deadline is not None and time.perf_counter() > deadline):
+        return None
+    defender = 3 - attacker
+    blocks = get_winning_plays(state, defender)
+    if len(blocks) > 1:  # the defender wins whatever the attacker does
+        return None
+    for play in blocks if len(blocks) == 1 else list(state.valid_pos):
+        state.run_play(play, record=False)
+        line = None
+        if not state.game_over and len(get_winning_plays(state, defender)) == 0:
+            threats = get_winning_plays(state, attacker)
+            if len(threats) > 1:  # double threat: the defender can only block one of them
+                line = [play, threats[0], threats[1]]
+            elif len(threats) == 1:  # the defender has to block
+                state.run_play(threats[0], record=False)
+                following = attack(state, attacker, plies - 2, deadline)
+                state.undo_play()
+                if following is not None:
+                    line = [play, threats[0]] + following
+        state.undo_play()
+        if line is not None:
+            return line
+    return None
+
+
+def find_forced_win(state, max_plies=7, time_limit=None):
+    """looks for a forced win of the player that plays next made only of threats
+    state: instance of State class (it is not modified)
+    max_plies: int: maximum number of plies of the winning sequence (counting the replies)
+    time_limit: float or None: time in seconds to give up
+    returns: list of tuples of two ints: winning sequence (the first one is the play to make) or None"""
+    if state.game_over:
+        return None
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    return attack(state.copy(), state.next_turn, max_plies, deadline)
+
+
+if __name__ == '__main__':
+    print(version)
@@ -0,0 +1,116 @@
+# -*- coding: utf8 -*-
+# transposition
+# helper class for cuatro
+# Alfredo Martin 2021
+
+import numpy as np
+
+version = 'transposition.v.1.0.0'
+
+# bound types of the stored scores
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class TranspositionTable:
+    """the instance of this class stores search results keyed by the zobrist hash of the positions in a fixed
+    amount of memory. The table is made of buckets of two slots: the first slot keeps the deepest entry (or the
+    one of the current search when the stored one is from an older search) and the second slot is always replaced
+    instance attributes:
+    mb: float: memory used by the table in MB
+    buckets: int: number of buckets of the table (a power of two)
+    keys: numpy array of shape (buckets, 2) of uint64: hash of the position stored in each slot
+    depths: numpy array of shape (buckets, 2) of int8: depth of the search of each slot (-1 if empty)
+    flags: numpy array of shape (buckets, 2) of int8: bound type of the score (EXACT, LOWER or UPPER)
+    scores: numpy array of shape (buckets, 2) of int32: score of each slot
+    moves: numpy array of shape (buckets, 2) of int16: best move of each slot (-1 if unknown)
+    ages: numpy array of shape (buckets, 2) of uint8: generation of the search that stored each slot
+    generation: int: generation of the current search (see new_search)
+    hits: int: number of probes that found the position
+    misses: int: number of probes that did not find the position
+    collisions: int: number of probes that found other positions in the slots of the bucket
+    """
+
+    entry_bytes = 8 + 1 + 1 + 4 + 2 + 1
+
+    def __init__(self, mb=16):
+        """initiallizes the instance
+        mb: float: maximum memory of the table in MB"""
+        buckets = max(1, int(mb * 2 ** 20 / (2 * self.entry_bytes)))
+        self.buckets = 2 ** (buckets.bit_length() - 1)  # rounded down to a power of two
+        self.mask = self.buckets - 1
+        self.mb = 2 * self.buckets * self.entry_bytes / 2 ** 20
+        self.keys = np.zeros((self.buckets, 2), dtype='uint64')
+        self.depths = np.full((self.buckets, 2), -1, dtype='int8')
+        self.flags = np.zeros((self.buckets, 2), dtype='int8')
+        self.scores = np.zeros((self.buckets, 2), dtype='int32')
+        self.moves = np.full((self.buckets, 2), -1, dtype='int16')
+        self.ages = np.zeros((self.buckets, 2), dtype='uint8')
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def new_search(self):
+        """starts a new generation: entries of older searches are replaced first"""
+        self.generation = (self.generation + 1) % 256
+
+    def clear(self):
+        """empties the table and resets the counters"""
+        self.depths[:] = -1
+        self.moves[:] = -1
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def probe(self, key):
+        """looks a position up in the table
+        key: int: zobrist hash of the position
+        returns: tuple of (depth, flag, score, move) or None if the position is not in the table"""
+        bucket = key & self.mask
+        key = np.uint64(key)
+        for slot in (0, 1):
+            if self.depths[bucket, slot] >= 0:
+                if self.keys[bucket, slot] == key:
+                    self.hits += 1
+                    return int(self.depths[bucket, slot]), int(self.flags[bucket, slot]), \
+                        int(self.scores[bucket, slot]), int(self.moves[bucket, slot])
+                self.collisions += 1
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, flag, score, move=-1):
+        """stores a search result
+        key: int: zobrist hash of the position
+        depth: int: depth of the search
+        flag: int: bound type of the score (EXACT, LOWER or UPPER)
+        score: int: score of the position
+        move: int: best move found (-1 if unknown)"""
+        bucket = key & self.mask
+        key = np.uint64(key)
+        if self.keys[bucket, 0] == key or self.depths[bucket, 0] <= depth \
+                or self.ages[bucket, 0] != self.generation:
+            slot = 0
+        else:
+            slot = 1
+        if move < 0 and self.keys[bucket, slot] == key:  # keep the move of a previous search of the position
+            move = self.moves[bucket, slot]
+        self.keys[bucket, slot] = key
+        self.depths[bucket, slot] = min(depth, 127)
+        self.flags[bucket, slot] = flag
+        self.scores[bucket, slot] = score
+        self.moves[bucket, slot] = move
+        self.ages[bucket, slot] = self.generation
+
+    def get_stats(self):
+        """returns the counters of the table
+        returns: dict with the fields 'mb', 'entries', 'used', 'hits', 'misses', 'collisions' and 'hit_rate'"""
+        probes = self.hits + self.misses
+        return {'mb': self.mb, 'entries': 2 * self.buckets, 'used': int((self.depths >= 0).sum()),
+                'hits': self.hits, 'misses': self.misses, 'collisions': self.collisions,
+                'hit_rate': self.hits / probes if probes > 0 else 0.}
+
+
+if __name__ == '__main__':
+    print(version)
@@ -0,0 +1,169 @@
+# -*- coding: utf8 -*-
+# worker
+# helper class for cuatro
+# Alfredo Martin 2021
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+version = 'worker.v.1.0.0'
+
+
+class EngineWorker:
+    """the instance of this class computes the plays of the computer in a worker thread, so the main loop keeps
+    rendering and reading the game pads while the engine searches. A request returns a future that the main loop
+    polls with get_result, and it can be cancelled (the engine is asked to stop and its play is discarded).
+    While the human thinks the worker can ponder: it searches the positions after the most likely replies of the
+    human in short slices (keeping the transposition table of the engine warm) and remembers the play found for
+    each of them, so the reply to a pondered play comes right away
+    instance attributes:
+    engine: instance of AlphaBeta or MCTS or None (None uses the score heuristic of the state)
+    delay: float: minimum time in seconds from the request of a play to its result (so the plays of the computer
+            can be followed). A play taken from the pondered positions is not delayed, it replies to the play the
+            human has just made
+    executor: instance of ThreadPoolExecutor with one thread
+    future: instance of Future or None: request in progress
+    pondering: instance of Future or None: pondering in progress
+    cancelled: instance of threading.Event: it is set to abandon the request or the pondering in progress
+    ponder_share: float: maximum fraction of the time the pondering keeps the cpu busy (0 disables pondering)
+    ponder_plays: int: number of replies of the human that are pondered
+    ponder_slice: float: time in seconds of each search of the pondering
+    pondered: dict: the key is the hash of a pondered position and the value a tuple of the play found and the time
+            in seconds spent searching it
+    ponder_fraction: float: fraction of the time limit of the engine that a position has to be pondered for its
+            play to be used (each slice searches again with the transposition table kept warm by the previous ones,
+            so the play found is close to the one of a full search well before the whole time limit)
+    ponder_hits: int: number of plays taken from the pondered positions
+    """
+
+    def __init__(self, engine=None, delay=0., ponder_share=0., ponder_plays=6, ponder_slice=0.05,
+                 ponder_fraction=0.25):
+        """initiallizes the instance
+        engine: instance of AlphaBeta or MCTS or None
+        delay: float: minimum time in seconds from the request of a play to its result
+        ponder_share: float: maximum fraction of the time the pondering keeps the cpu busy (0 disables it)
+        ponder_plays: int: number of replies of the human that are pondered
+        ponder_slice: float: time in seconds of each search of the pondering
+        ponder_fraction: float: fraction of the time limit of the engine that a position has to be pondered for its
+                play to be used"""
+        self.engine = engine
+        self.delay = delay
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None
+        self.pondering = None
+        self.cancelled = threading.Event()
+        self.ponder_share = ponder_share
+        self.ponder_plays = ponder_plays
+        self.ponder_slice = ponder_slice
+        self.ponder_fraction = ponder_fraction
+        self.pondered = dict()
+        self.ponder_hits = 0
+
+    def search(self, state, cancelled):
+        """chooses a play (it runs in the worker thread)
+        state: instance of State class: copy of the position, only used by this thread
+        cancelled: instance of threading.Event: set if the request is cancelled
+        returns: play: tuple of two ints or None if the request was cancelled"""
+        start = time.perf_counter()
+        delay = self.delay
+        play = state.get_book_play()
+        if cancelled.is_set():
+            return None
+        if play is None and self.engine is not None and state.hash in self.pondered:
+            pondered_play, seconds = self.pondered[state.hash]
+            if seconds >= self.ponder_fraction * self.engine.time_limit and pondered_play in state.valid_pos:
+                play = pondered_play
+                self.ponder_hits += 1
+                delay = 0.
+        if play is None and self.engine is not None:
+            play = self.engine.get_play(state)
+        if play is None:
+            play = state.get_best_score_play()[0]
+        cancelled.wait(max(0., delay - (time.perf_counter() - start)))  # returns right away if cancelled
+        return None if cancelled.is_set() else play
+
+    def ponder_search(self, state, cancelled):
+        """searches the positions after the most likely replies of the human, one slice at a time in turns, until
+        it is cancelled or every position has been searched for the time limit of the engine (it runs in the worker
+        thread). After every slice the thread rests so the cpu share stays under ponder_share
+        state: instance of State class: copy of the position with the human to play, only used by this thread
+        cancelled: instance of threading.Event: set when the pondering has to stop"""
+        time_limit = self.engine.time_limit
+        children = []
+        for reply in self.engine.get_ordered_plays(state)[:self.ponder_plays]:
+            child = state.copy()
+            child.run_play(reply, record=False)
+            if not child.game_over:
+                children.append(child)
+        try:
+            while not cancelled.is_set():
+                children = [child for child in children if self.pondered.get(child.hash, (None, 0.))[1] < time_limit]
+                if len(children) == 0:
+                    break
+                for child in children:
+                    if cancelled.is_set():
+                        break
+                    start = time.perf_counter()
+                    self.engine.time_limit = self.ponder_slice
+                    play = self.engine.get_play(child)
+                    self.engine.time_limit = time_limit
+                    busy = time.perf_counter() - start
+                    if cancelled.is_set():  # the search was stopped, its play may be poor
+                        break
+                    self.pondered[child.hash] = (play, self.pondered.get(child.hash, (None, 0.))[1] + busy)
+                    cancelled.wait(busy * (1. - self.ponder_share) / self.ponder_share)
+        finally:
+            self.engine.time_limit = time_limit
+
+    def submit(self, state):
+        """requests a play for the player that plays next (a request or pondering in progress is cancelled)
+        state: instance of State class (it is copied, so it can keep changing in the main thread)
+        returns: instance of Future: its result is the play"""
+        self.cancel()
+        self.cancelled = threading.Event()  # every request has its own event so a cancelled search stays cancelled
+        self.future = self.executor.submit(self.search, state.copy(), self.cancelled)
+        return self.future
+
+    def ponder(self, state):
+        """starts pondering the replies of the human (nothing is done if pondering is disabled or the engine has no
+        time limited search with move ordering)
+        state: instance of State class with the human to play (it is copied)"""
+        if self.ponder_share <= 0 or not hasattr(self.engine, 'get_ordered_plays') or state.game_over:
+            return
+        self.cancel()
+        self.cancelled = threading.Event()
+        self.pondered = dict()
+        self.pondering = self.executor.submit(self.ponder_search, state.copy(), self.cancelled)
+
+    def get_result(self):
+        """polls the request in progress
+        returns: play: tuple of two ints or None if there is no request or it has not finished"""
+        if self.future is None or not self.future.done():
+            return None
+        future = self.future
+        self.future = None
+        return future.result()
+
+    def cancel(self):
+        """cancels the request and the pondering in progress (the engine stops at its next check of the time)"""
+        if self.future is None and self.pondering is None:
+            return
+        self.cancelled.set()
+        running = False
+        for future in (self.future, self.pondering):
+            if future is not None and not future.cancel():
+                running = running or not future.done()
+        if running and hasattr(self.engine, 'stop'):
+            self.engine.stop()
+        self.future = None
+        self.pondering = None
+
+    def close(self):
+        """cancels the request in progress and stops the thread"""
+        self.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == '__main__':
+    print(version)
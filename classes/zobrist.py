@@ -0,0 +1,30 @@
+# -*- coding: utf8 -*-
+# zobrist
+# helper functions for cuatro
+# Alfredo Martin 2021
+
+import random
+
+version = 'zobrist.v.1.0.0'
+
+# keys already built, the key of the dictionary is the size of the board
+_keys = dict()
+
+
+def get_zobrist_keys(size):
+    """returns the (shared) random keys used to hash the positions of a board. The keys are generated with a fixed
+    seed so the hashes are the same in every process and in every run (they can be stored in files)
+    size: int: size of the board
+    returns: tuple of:
+        keys: list of two lists of ints: one 64 bit key for each cell (flat index of the 3d board) and player
+        turn_key: int: key that is xored when player 2 plays next"""
+    if size not in _keys:
+        rng = random.Random(size)  # the standard library generator avoids loading numpy.random at start up
+        keys = [[rng.randrange(1, 2 ** 63) for _ in range(size ** 3)] for _ in range(2)]
+        turn_key = rng.randrange(1, 2 ** 63)
+        _keys[size] = (keys, turn_key)
+    return _keys[size]
+
+
+if __name__ == '__main__':
+    print(version)
@@ -3,24 +3,13 @@
 # helper class for cuatro
 # Alfredo Martin 2021
 
-import pygame
-import numpy as np
 import os
+import sys
 import random
-
-os.environ['SDL_VIDEO_WINDOW_POS'] = "%d, %d" % (90, 30)  # positions the screen in a specific position of the monitor
-from classes.screenpos import ScreenPos
-from classes.board import Board
-from classes.cursor import Cursor
 from classes.engine import State
-from classes.get2dcoords import Get2dcoords
-from classes.game import Game
-from classes.draw import Draw
-from classes.front_cover import Cover
-from classes.anouncement import Announcement
-from classes.controller import Controller
+from classes.book import load_book
+from classes.record import HistorySink, RecordWriter
 import argparse
-import time
 
 
 def parse_args():
@@ -62,9 +51,75 @@ def parse_args():
     parser.add_argument('--time_limit', type=float, default=1.0)
     parser.add_argument('--player1_name', type=str, default='red')
     parser.add_argument('--player2_name', type=str, default='blue')
+    parser.add_argument('--engine', type=str, default='score', choices=['score', 'alphabeta', 'mcts'])
+    parser.add_argument('--engine_time', type=float, default=0.5)
+    parser.add_argument('--engine_table_mb', type=float, default=16)
+    parser.add_argument('--engine_workers', type=int, default=1)
+    parser.add_argument('--ponder_share', type=float, default=0.3)
+    parser.add_argument('--book_dir', type=str, default='books')
+    parser.add_argument('--headless', action='store_true')
+    parser.add_argument('--human_player', type=int, default=0, choices=[0, 1, 2])
+    parser.add_argument('--profile', action='store_true')
+    parser.add_argument('--profile_csv', type=str, default=None)
+    parser.add_argument('--record', type=str, default=None)
+    parser.add_argument('--no_culling', action='store_true')
+    parser.add_argument('--occlusion_culling', action='store_true')
+    parser.add_argument('--raster', type=str, default='batched', choices=['batched', 'reference'])
+    parser.add_argument('--sprites', action='store_true')
+    parser.add_argument('--sprite_cache', type=int, default=256)
     args = parser.parse_args()
     return args
 
+def get_engine(args):
+    """creates the engine for the plays of the computer (its module is only imported if it is used)
+    args: parsed arguments
+    returns: instance of AlphaBeta or MCTS or None (None uses the score heuristic of the state)"""
+    if args.engine == 'alphabeta':
+        from classes.search import AlphaBeta
+        return AlphaBeta(time_limit=args.engine_time, table_mb=args.engine_table_mb)
+    if args.engine == 'mcts':
+        from classes.mcts import MCTS
+        return MCTS(time_limit=args.engine_time, workers=args.engine_workers)
+    return None
+
+
+def run_headless(args):
+    """plays a game without display nor sound (pygame is not imported). The computer plays for both players or, if
+    human_player is 1 or 2, the plays of that player are read from the standard input (two ints per line: x y).
+    Every play is printed as it is made
+    args: parsed arguments"""
+    engine = get_engine(args)
+    recorder = None if args.record is None else RecordWriter(args.record, size=args.game_size)
+    state = State(size=args.game_size, win=args.game_win, next_turn=random.randint(1, 2))
+    state.book = load_book(args.game_size, args.game_win, args.book_dir)
+    state.sinks = [HistorySink()] if recorder is None else [HistorySink(), recorder]
+    while not state.game_over:
+        if state.next_turn == args.human_player:
+            line = sys.stdin.readline()
+            if line == '':  # end of the input
+                break
+            try:
+                play = tuple(int(x) for x in line.replace(',', ' ').split())
+            except ValueError:
+                play = None
+            if play not in state.valid_pos:
+                print({'ilegal_play': line.strip()})
+                continue
+        else:
+            play = state.get_book_play()
+            if play is None and engine is not None:
+                play = engine.get_play(state)
+        state.run_play(play=play)
+        sys.stdout.flush()
+    print({'winner': state.winner, 'plays': len(state.moves)})
+    if engine is not None and hasattr(engine, 'close'):
+        engine.close()
+    if recorder is not None:
+        recorder.close()
+    if state.book is not None:
+        state.book.close()
+
+
 def initiallize_game(n_joys):
     """initiallizes the game
     n_joys: number of game pads detected"""
@@ -73,6 +128,8 @@ def initiallize_game(n_joys):
     space = int(args.space_factor * args.screen_width / args.game_size)
     screen = pygame.display.set_mode((args.screen_width, args.screen_height))
     state = State(size=args.game_size, win=args.game_win, next_turn=random.randint(1, 2))
+    state.book = book  # opened once for all the games (None if there is no book for this game)
+    state.sinks = [HistorySink()] if recorder is None else [HistorySink(), recorder]  # prints and records the plays
     screenpos = ScreenPos(c=args.camera_pos,
                           t=args.camera_angle,
                           e=args.screen_pos,
@@ -94,11 +151,13 @@ def initiallize_game(n_joys):
                 width=width,
                 space=space,
                 colors=(args.player_color_1, args.player_color_2),
-                edge_colors=(args.player_edge_color_1, args.player_edge_color_2))
+                edge_colors=(args.player_edge_color_1, args.player_edge_color_2),
+                occlusion=args.occlusion_culling)
     get2dcoords = Get2dcoords(light_pos=args.light_pos,
                               offset=args.offset,
+                              cull=not args.no_culling,
                               screenpos=screenpos)
-    drawer = Draw(max_shading=args.max_shading)
+    drawer = Draw(max_shading=args.max_shading, raster=args.raster)
     cover = Cover(cover_image=os.path.join('.', 'images', args.cover_image),
                   cover_music=os.path.join('.', 'sounds', args.cover_music),
                   screen_shape=(args.screen_width, args.screen_height))
@@ -109,13 +168,34 @@ def initiallize_game(n_joys):
                             max_beta=args.max_beta)
     player = [args.player1_name, args.player2_name]
     announcements = []
+    scene = Scene(board=board, size=args.game_size)
     return screen, state, screenpos, board, cursor, game, get2dcoords, drawer, cover, \
-           controller, player, announcements
+           controller, player, announcements, scene
 
 
 if __name__ == '__main__':
     # Initiallization
     args = parse_args()
+    if args.headless:
+        run_headless(args)
+        quit()
+    # the display, sound and drawing modules are only imported when the game is shown
+    import pygame
+    os.environ['SDL_VIDEO_WINDOW_POS'] = "%d, %d" % (90, 30)  # positions the screen in a specific position of the monitor
+    from classes.screenpos import ScreenPos
+    from classes.board import Board
+    from classes.cursor import Cursor
+    from classes.get2dcoords import Get2dcoords
+    from classes.game import Game
+    from classes.scene import Scene
+    from classes.draw import Draw
+    from classes.front_cover import Cover
+    from classes.anouncement import Announcement
+    from classes.controller import Controller
+    from classes.frametimer import FrameTimer
+    from classes.frametracker import FrameTracker
+    from classes.sprites import SpriteDraw
+    from classes.worker import EngineWorker
     pygame.display.init()
     pygame.mixer.init()
     pygame.font.init()
@@ -139,9 +219,26 @@ if __name__ == '__main__':
     play_sound.set_volume(0.1)
     ilegal_sound = pygame.mixer.Sound(os.path.join('.', 'sounds', args.ilegal_sound))
     ilegal_sound.set_volume(0.1)
+    # engine for the plays of the computer (None uses the score heuristic of the state)
+    engine = get_engine(args)
+    # the plays of the computer are computed in a thread (at least one second each, so they can be followed). The
+    # thread also ponders the replies of the human while the human thinks, using at most ponder_share of the cpu, and
+    # the reply to a pondered play is made right away
+    worker = EngineWorker(engine, delay=1., ponder_share=args.ponder_share)
+    # binary record of the games (one byte per play)
+    recorder = None if args.record is None else RecordWriter(args.record, size=args.game_size)
+    # opening book of the board (None if there is no book for this game)
+    book = load_book(args.game_size, args.game_win, args.book_dir)
+    # timing of the stages of every frame (shown with --profile, streamed to a file with --profile_csv)
+    timer = FrameTimer(enabled=args.profile or args.profile_csv is not None, overlay=args.profile,
+                       csv_path=args.profile_csv)
+    # renders a frame only when something that is shown has changed
+    tracker = FrameTracker()
     # initiallize game
     screen, state, screenpos, board, cursor, game, get2dcoords, drawer, cover, \
-    controller, player, announcements = initiallize_game(len(joysticks))
+    controller, player, announcements, scene = initiallize_game(len(joysticks))
+    # the stones can be drawn as blits of pre-rendered cubes (kept for all the games)
+    sprites = SpriteDraw(cube3d=game.bcube3d, max_sprites=args.sprite_cache) if args.sprites else None
     logo_rect = logo.get_rect()
     screen_rect = screen.get_rect()
     logo_pos = ((screen_rect[2] / 2) - (logo_rect[2] / 2), screen_rect[3] * args.horizon * 1.2)
@@ -151,31 +248,48 @@ if __name__ == '__main__':
 
     game_exit = False
     while not game_exit:
+        timer.start_frame()
         # event loop
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                worker.close()
+                timer.close()
+                if recorder is not None:
+                    recorder.close()
+                if book is not None:
+                    book.close()
                 pygame.quit()
                 quit()
                 game_exit = True
+        timer.stop('input')
         clock.tick(20)
-        screen.fill(args.background_color)
-        screen.blit(logo, logo_pos)
-        if len(joysticks) > 0 and (len(joysticks) >= state.next_turn or state.game_over):  # the play is going to be made by a human
-            # next we get actions (moving the game or playing) from the joystick
-            if state.game_over and len(joysticks) == 1:  # figures out which joy to read based on state status
+        timer.start()  # the wait of the clock is not measured
+        # the play is going to be made by a human
+        human = len(joysticks) > 0 and (len(joysticks) >= state.next_turn or state.game_over)
+        if len(joysticks) > 0:
+            # next we get actions (moving the game or playing) from the joystick. While the computer is thinking
+            # the board can still be moved, reset or exited
+            if not human or (state.game_over and len(joysticks) == 1):  # figures out which joy to read based on state status
                 joy_number = 0
             else:
                 joy_number = state.next_turn - 1
             controller.get_status(joysticks[joy_number])
-            cursor.pos = controller.cursor_pos
+            timer.stop('input')
+            if human:
+                cursor.pos = controller.cursor_pos
             if controller.action == 'exit_game':
                 game_exit = True
             if controller.action == 'reset_game':
+                worker.cancel()  # the play the computer was computing for the previous game is discarded
                 if state.winner > 0:  # if previously there was a winner the music had stopped
                     music.play(loops=-1)
                 screen, state, screenpos, board, cursor, game, get2dcoords, drawer, cover, \
-                controller, player, announcements = initiallize_game(len(joysticks))
+                controller, player, announcements, scene = initiallize_game(len(joysticks))
                 cursor.pos = controller.cursor_pos
+                tracker.invalidate()
+        if human:
+            if worker.pondering is None and len(joysticks) == 1:  # the computer will reply to this play
+                worker.ponder(state)
             if controller.action == 'play':
                 if state.run_play(play=controller.cursor_pos):
                     controller.cursor_pos = cursor.pos = (0, 0)
@@ -184,44 +298,65 @@ if __name__ == '__main__':
                 else:
                     if not state.game_over:
                         ilegal_sound.play()
-                # time.sleep(1)
-        else:  # the play is being made by the engine state
+        else:  # the play is being made by the engine in the worker thread, the loop keeps rendering meanwhile
             if not state.winner > 0 and not state.game_over:
-                time.sleep(1)
-                # state.run_play(play=state.get_best_score_play())  # todo remove after testing
-                state.run_play()
-                cursor.pos = controller.cursor_pos = (0, 0)
-                play_sound.play()
-        board.get_polygons3d(controller.a)
-        cursor.get_polygons3d(state)
-        game.get_polygons3d(state)
-
-        if len(game.polygons3d) > 0 and state.winner == 0 and len(joysticks) > 0:  # showing everything
-            polygons3d = np.concatenate([board.polygons3d, game.polygons3d, cursor.polygons3d], axis=0)
-            colors = np.concatenate([board.colors3d, game.colors3d, cursor.colors3d], axis=0)
-            edge_colors = np.concatenate([board.edge_colors3d, game.edge_colors3d, cursor.edge_colors3d], axis=0)
-        elif state.winner > 0 or len(joysticks) == 0:  # not showing the cursor
-            polygons3d = np.concatenate([board.polygons3d, game.polygons3d], axis=0)
-            colors = np.concatenate([board.colors3d, game.colors3d], axis=0)
-            edge_colors = np.concatenate([board.edge_colors3d, game.edge_colors3d], axis=0)
-        else:  # game has not started so not showing the state of game
-            polygons3d = np.concatenate([board.polygons3d, cursor.polygons3d], axis=0)
-            colors = np.concatenate([board.colors3d, cursor.colors3d], axis=0)
-            edge_colors = np.concatenate([board.edge_colors3d, cursor.edge_colors3d], axis=0)
-        coords, colors, edge_colors, shading = get2dcoords.get_polygons2d(polygons3d=polygons3d,
-                                                                          colors=colors,
-                                                                          edge_colors=edge_colors,
-                                                                          angles=(controller.a,
-                                                                                  controller.b,
-                                                                                  controller.g))
+                if worker.future is None:
+                    worker.submit(state)
+                play = worker.get_result()
+                if play is not None:
+                    state.run_play(play=play)
+                    cursor.pos = controller.cursor_pos = (0, 0)
+                    play_sound.play()
+        timer.stop('engine')
         if state.winner > 0:
-            announcements.append(Announcement('The winner is ' + player[state.previous_turn - 1],
-                                              time=200, color=(0, 0, 0)))
+            winner_text = 'The winner is ' + player[state.previous_turn - 1]
+            # the announcement is renewed when it expires, so it is shown until the game is reset
+            if not any(announcement.message == winner_text for announcement in announcements):
+                announcements.append(Announcement(winner_text, time=200, color=(0, 0, 0)))
             music.stop()
-        for announcement in announcements:
-            announcement.update(screen)
-        screen = drawer.draw(screen, coords, colors, edge_colors, shading)
-        pygame.display.update()
+        # the cursor is not shown when the game is won or when the computer plays against itself
+        show_cursor = state.winner == 0 and len(joysticks) > 0
+        # the frame is only rendered if something that is shown has changed, otherwise the screen already shows it
+        if tracker.changed(controller.a, controller.b, controller.g, cursor.pos, show_cursor, state.next_turn,
+                           state.changes, tuple(sorted(set(announcement.message for announcement in announcements)))):
+            cursor.get_polygons3d(state)
+            game.get_polygons3d(state)
+            scene.update(game=game, cursor=cursor if show_cursor else None)
+            polygons3d, colors, edge_colors = scene.get_polygons3d(cursor=show_cursor)
+            timer.stop('geometry')
+            screen.fill(args.background_color)
+            screen.blit(logo, logo_pos)
+            for announcement in announcements:
+                announcement.update(screen)
+            timer.stop('raster')
+            if sprites is None:
+                coords, colors, edge_colors, shading = get2dcoords.get_polygons2d(polygons3d=polygons3d,
+                                                                                  colors=colors,
+                                                                                  edge_colors=edge_colors,
+                                                                                  angles=(controller.a,
+                                                                                          controller.b,
+                                                                                          controller.g),
+                                                                                  visible=scene.get_visible3d(
+                                                                                      cursor=show_cursor))
+                timer.stop('projection')
+                screen = drawer.draw(screen, coords, colors, edge_colors, shading)
+            else:  # the projection of the board and of the centers of the stones is measured as raster
+                screen = sprites.draw(screen, scene=scene, game=game, get2dcoords=get2dcoords, drawer=drawer,
+                                      angles=(controller.a, controller.b, controller.g), cursor=show_cursor)
+            timer.draw(screen)
+            timer.stop('raster')
+            pygame.display.update()
+            timer.stop('display')
+        else:
+            for announcement in announcements:
+                announcement.update()  # the time of the announcements still runs
+        timer.end_frame()
         announcements = [announcement for announcement in announcements if announcement.active]
+    worker.close()
+    timer.close()
+    if recorder is not None:
+        recorder.close()
+    if book is not None:
+        book.close()
     pygame.quit()
     quit()
@@ -0,0 +1,216 @@
+# -*- coding: utf8 -*-
+# tournament
+# headless engine vs engine tournaments for cuatro
+# Alfredo Martin 2021
+
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from classes.engine import State
+from classes.search import AlphaBeta
+from classes.mcts import MCTS
+
+version = 'tournament.v.1.0.0'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="""plays round robin matches between engines without display.
+    Players are given as name or name:seconds_per_play, names are score, random, alphabeta and mcts""")
+    parser.add_argument('--players', type=str, nargs='+', default=['score', 'alphabeta:0.2', 'mcts:0.5'])
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--game_size', type=int, default=5)
+    parser.add_argument('--game_win', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output', type=str, default='tournament.jsonl')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--bootstrap', type=int, default=200)
+    args = parser.parse_args()
+    return args
+
+
+class Player:
+    """the instance of this class chooses the plays of one of the players of the tournament
+    instance attributes:
+    spec: str: name or name:seconds_per_play
+    name: str: score, random, alphabeta or mcts
+    engine: instance of AlphaBeta or MCTS or None
+    rng: instance of random.Random (for the random player)
+    """
+
+    def __init__(self, spec, seed=None):
+        """spec: str: name or name:seconds_per_play
+        seed: int or None: seed of the random generators"""
+        self.spec = spec
+        self.name, _, seconds = spec.partition(':')
+        time_limit = float(seconds) if seconds != '' else 0.5
+        self.rng = random.Random(seed)
+        if self.name == 'alphabeta':
+            self.engine = AlphaBeta(time_limit=time_limit)
+        elif self.name == 'mcts':
+            self.engine = MCTS(time_limit=time_limit, seed=seed)
+        elif self.name in ('score', 'random'):
+            self.engine = None
+        else:
+            raise ValueError('unknown player ' + spec)
+
+    def get_play(self, state):
+        """chooses a play
+        state: instance of State class
+        returns: tuple of two ints"""
+        if self.engine is not None:
+            return self.engine.get_play(state)
+        if self.name == 'random':
+            return self.rng.choice(state.valid_pos)
+        return state.get_best_score_play()[0]
+
+
+def play_game(size, win, specs, seed):
+    """plays a game (module function so it can run in other processes). specs[0] plays first
+    size: int: size of the board
+    win: int: how many items in a row constitute a win of the game
+    specs: tuple of two str: players
+    seed: int: seed of the random generators
+    returns: dict with the fields 'first', 'second', 'winner' (the spec of the winner or None if it is a draw),
+            'plays', 'seconds' and 'seed'"""
+    start = time.perf_counter()
+    state = State(size=size, win=win, next_turn=1, seed=seed)
+    players = [Player(spec, seed=seed + i) for i, spec in enumerate(specs)]
+    while not state.game_over:
+        state.run_play(players[state.next_turn - 1].get_play(state), record=False)
+    return {'first': specs[0], 'second': specs[1], 'winner': specs[state.winner - 1] if state.winner > 0 else None,
+            'plays': len(state.moves), 'seconds': time.perf_counter() - start, 'seed': seed}
+
+
+def get_scores(results, players):
+    """counts wins, draws and losses
+    results: list of dicts returned by play_game
+    players: list of str
+    returns: dict: the key is each player and the value a dict with 'wins', 'draws' and 'losses'"""
+    table = {player: {'wins': 0, 'draws': 0, 'losses': 0} for player in players}
+    for result in results:
+        for player in (result['first'], result['second']):
+            if result['winner'] is None:
+                table[player]['draws'] += 1
+            elif result['winner'] == player:
+                table[player]['wins'] += 1
+            else:
+                table[player]['losses'] += 1
+    return table
+
+
+def get_elo(results, players, iterations=200):
+    """fits the Elo ratings of the players (Bradley-Terry model, draws count as half a win for each player). Every
+    pair of players gets a virtual draw so the ratings are finite when a player wins or loses every game. The
+    average rating is 0
+    results: list of dicts returned by play_game
+    players: list of str
+    iterations: int: iterations of the fit
+    returns: dict: the key is each player and the value its rating"""
+    index = {player: i for i, player in enumerate(players)}
+    n = len(players)
+    wins = [[0.] * n for _ in range(n)]  # wins[i][j]: score of i against j
+    for i, j in itertools.combinations(range(n), 2):
+        wins[i][j] += 0.5
+        wins[j][i] += 0.5
+    for result in results:
+        i = index[result['first']]
+        j = index[result['second']]
+        if result['winner'] is None:
+            wins[i][j] += 0.5
+            wins[j][i] += 0.5
+        elif result['winner'] == result['first']:
+            wins[i][j] += 1.
+        else:
+            wins[j][i] += 1.
+    gamma = [1.] * n
+    for _ in range(iterations):
+        for i in range(n):
+            games = sum((wins[i][j] + wins[j][i]) / (gamma[i] + gamma[j]) for j in range(n) if j != i)
+            if games > 0:
+                gamma[i] = sum(wins[i]) / games
+        mean = sum(math.log(g) for g in gamma) / n
+        gamma = [g / math.exp(mean) for g in gamma]
+    return {player: 400. * math.log10(gamma[index[player]]) for player in players}
+
+
+def get_elo_intervals(results, players, samples=200, seed=0):
+    """computes 95% confidence intervals of the Elo ratings resampling the games (bootstrap)
+    results: list of dicts returned by play_game
+    players: list of str
+    samples: int: number of resamples
+    seed: int: seed of the resampling
+    returns: dict: the key is each player and the value a tuple with the lower and upper bounds"""
+    rng = random.Random(seed)
+    ratings = {player: [] for player in players}
+    for _ in range(samples):
+        elo = get_elo([rng.choice(results) for _ in results], players, iterations=50)
+        for player in players:
+            ratings[player].append(elo[player])
+    intervals = dict()
+    for player in players:
+        values = sorted(ratings[player])
+        intervals[player] = (values[int(0.025 * (samples - 1))], values[int(0.975 * (samples - 1))])
+    return intervals
+
+
+def run_tournament(players, games=10, size=5, win=4, workers=1, output=None, seed=0):
+    """plays a round robin tournament: every pair of players plays games games, alternating who plays first
+    players: list of str: specs of the players
+    games: int: games per pair of players
+    size: int: size of the board
+    win: int: how many items in a row constitute a win of the game
+    workers: int: number of processes
+    output: file object or None: the result of every game is written to it as a json line as soon as it finishes
+    seed: int: seed of the games
+    returns: tuple of the list of results and the time in seconds"""
+    jobs = []
+    for a, b in itertools.combinations(players, 2):
+        for game in range(games):
+            specs = (a, b) if game % 2 == 0 else (b, a)
+            jobs.append((size, win, specs, seed + len(jobs)))
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as executor:
+        for future in as_completed([executor.submit(play_game, *job) for job in jobs]):
+            results.append(future.result())
+            if output is not None:
+                output.write(json.dumps(results[-1]) + '\n')
+                output.flush()
+    return results, time.perf_counter() - start
+
+
+def print_report(results, players, seconds, samples=200):
+    """prints the win/draw/loss table, the Elo ratings and the speed of the tournament
+    results: list of dicts returned by play_game
+    players: list of str
+    seconds: float: duration of the tournament
+    samples: int: number of resamples of the confidence intervals"""
+    table = get_scores(results, players)
+    elo = get_elo(results, players)
+    intervals = get_elo_intervals(results, players, samples=samples)
+    width = max(len(player) for player in players) + 2
+    print('player'.ljust(width) + '  wins draws losses      elo   95% interval')
+    for player in sorted(players, key=lambda p: -elo[p]):
+        print(player.ljust(width) + '{:6d}{:6d}{:7d}{:9.1f}   [{:.1f}, {:.1f}]'.format(
+            table[player]['wins'], table[player]['draws'], table[player]['losses'], elo[player],
+            intervals[player][0], intervals[player][1]))
+    print('{} games in {:.1f} seconds ({:.2f} games per second)'.format(len(results), seconds,
+                                                                       len(results) / seconds))
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    for spec in args.players:
+        Player(spec)  # fails early with unknown players
+    with open(args.output, 'w') as f:
+        results, seconds = run_tournament(args.players, games=args.games, size=args.game_size, win=args.game_win,
+                                          workers=args.workers, output=f, seed=args.seed)
+    print_report(results, args.players, seconds, samples=args.bootstrap)
+    if 'pygame' in sys.modules:
+        print('warning: pygame was imported')